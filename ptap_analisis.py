@@ -0,0 +1,183 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Motor analítico en proceso (DuckDB)                     ║
+║  Cumplimiento y estadísticas por cualquier combinación          ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Las muestras (Sheet + archivo histórico) se cargan una vez por versión de datos
+en una base DuckDB en memoria. La carga pasa las mediciones a formato largo
+(una por parámetro), las clasifica contra ``LIMITES`` y las consolida en la
+tabla ``diario``: por día × locación × operador × parámetro guarda conteos por
+estado (óptimo / alerta / crítico), suma, suma de cuadrados, mínimo y máximo.
+
+Cualquier consulta agrupa por una combinación de Locación, Operador,
+Parámetro y período (día … año), filtra por valores y por rango de días, y se
+resuelve sobre esa tabla: su tamaño depende de los días y las combinaciones
+activas, no de la cantidad de muestras. Con millones de filas responde en
+milisegundos.
+
+    python ptap_analisis.py --filas 1000000,5000000
+"""
+import argparse
+import sys
+import threading
+import time
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+PARAMETROS = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
+DIMENSIONES = {"Locación": "locacion", "Operador": "operador", "Parámetro": "parametro"}
+PERIODOS = {"Día": "day", "Semana": "week", "Mes": "month", "Trimestre": "quarter", "Año": "year"}
+
+
+class MotorAnalisis:
+    """Base DuckDB en memoria con la tabla ``diario`` de un snapshot de muestras."""
+
+    def __init__(self, df: pd.DataFrame, limites: dict):
+        self._con = duckdb.connect(":memory:")
+        self._lock = threading.Lock()
+        params = [p for p in PARAMETROS if p in df.columns]
+        fuente = pd.DataFrame({
+            "fecha": pd.to_datetime(df["Fecha_Hora"], errors="coerce"),
+            "locacion": df["Locación"].astype(str),
+            "operador": df["Operador"].astype(str),
+            **{p: pd.to_numeric(df[p], errors="coerce") for p in params},
+        })
+        limites_df = pd.DataFrame([
+            {"parametro": p, "lo_opt": limites[p]["optimo"][0], "hi_opt": limites[p]["optimo"][1],
+             "lo_alr": limites[p]["alerta"][0], "hi_alr": limites[p]["alerta"][1]}
+            for p in params
+        ])
+        self._con.register("fuente", fuente)
+        self._con.register("limites_df", limites_df)
+        columnas = ", ".join(f'"{p}"' for p in params)
+        self._con.execute(f"""
+            CREATE TABLE diario AS
+            SELECT CAST(m.fecha AS DATE) AS dia, m.locacion, m.operador, m.parametro,
+                   count(*) AS n,
+                   count(*) FILTER (WHERE m.valor BETWEEN l.lo_opt AND l.hi_opt) AS n_ok,
+                   count(*) FILTER (WHERE NOT m.valor BETWEEN l.lo_opt AND l.hi_opt
+                                    AND m.valor BETWEEN l.lo_alr AND l.hi_alr) AS n_alerta,
+                   sum(m.valor) AS suma, sum(m.valor * m.valor) AS suma2,
+                   min(m.valor) AS minimo, max(m.valor) AS maximo
+            FROM (UNPIVOT fuente ON {columnas} INTO NAME parametro VALUE valor) m
+            JOIN limites_df l USING (parametro)
+            WHERE m.fecha IS NOT NULL AND NOT isnan(m.valor)
+            GROUP BY ALL
+            ORDER BY dia
+        """)
+        self._con.unregister("fuente")
+        self._con.unregister("limites_df")
+        resumen = self._con.execute("SELECT sum(n), min(dia), max(dia), count(*) FROM diario").fetchone()
+        self.filas = int(resumen[0] or 0)
+        self.desde, self.hasta, self.grupos_diarios = resumen[1], resumen[2], resumen[3]
+        self.opciones = {
+            dim: [v for (v,) in self._con.execute(f"SELECT DISTINCT {col} FROM diario ORDER BY 1").fetchall()]
+            for dim, col in DIMENSIONES.items()
+        }
+
+    def __len__(self) -> int:
+        return self.filas
+
+    def consultar(self, agrupar: list = (), periodo: str = None, filtros: dict = None,
+                  desde=None, hasta=None) -> pd.DataFrame:
+        """
+        Cumplimiento (% óptimo / alerta / crítico) por grupo. ``agrupar`` son
+        claves de ``DIMENSIONES``, ``periodo`` una de ``PERIODOS``, ``filtros``
+        ``{dimensión: [valores]}`` y ``desde``/``hasta`` días completos. Como en
+        el resto del dashboard, el cumplimiento es por parámetro: los porcentajes
+        y las estadísticas solo se calculan si cada grupo corresponde a un único
+        parámetro; si no, solo se cuentan las mediciones.
+        """
+        filtros = {dim: list(v) for dim, v in (filtros or {}).items() if v}
+        desconocidas = (set(agrupar) | set(filtros)) - set(DIMENSIONES)
+        if desconocidas or (periodo is not None and periodo not in PERIODOS):
+            raise ValueError(f"Dimensión o período inválido: {sorted(desconocidas) or periodo}")
+
+        columnas = [f'{DIMENSIONES[d]} AS "{d}"' for d in agrupar]
+        if periodo:
+            columnas.insert(0, f"CAST(date_trunc('{PERIODOS[periodo]}', dia) AS DATE) AS \"Período\"")
+        metricas = ['CAST(sum(n) AS BIGINT) AS "Mediciones"']
+        if "Parámetro" in agrupar or len(filtros.get("Parámetro", [])) == 1:
+            # Varianza muestral desde las sumas: (Σx² - (Σx)²/n) / (n - 1)
+            metricas += ['round(100 * sum(n_ok) / sum(n), 1) AS "% Cumplimiento"',
+                         'round(100 * sum(n_alerta) / sum(n), 1) AS "% Alerta"',
+                         'round(100 * (sum(n) - sum(n_ok) - sum(n_alerta)) / sum(n), 1) AS "% Crítico"',
+                         'round(sum(suma) / sum(n), 3) AS "Promedio"', 'round(min(minimo), 3) AS "Mín"',
+                         'round(max(maximo), 3) AS "Máx"',
+                         'round(sqrt(greatest(sum(suma2) - sum(suma) * sum(suma) / sum(n), 0)'
+                         ' / nullif(sum(n) - 1, 0)), 3) AS "Desv. est."']
+
+        condiciones, valores = [], []
+        for dim, lista in filtros.items():
+            condiciones.append(f"list_contains(?, {DIMENSIONES[dim]})")
+            valores.append(lista)
+        if desde is not None:
+            condiciones.append("dia >= ?")
+            valores.append(pd.Timestamp(desde).date())
+        if hasta is not None:
+            condiciones.append("dia <= ?")
+            valores.append(pd.Timestamp(hasta).date())
+
+        sql = f"SELECT {', '.join(columnas + metricas)} FROM diario"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        if columnas:
+            sql += " GROUP BY ALL ORDER BY ALL"
+        # Una conexión DuckDB no admite consultas simultáneas desde varios hilos
+        with self._lock:
+            return self._con.execute(sql, valores).df()
+
+
+# ═══════════════════════════════════════════════════════════════
+# BENCHMARK
+# ═══════════════════════════════════════════════════════════════
+CONSULTAS = {
+    "operador × locación × parámetro × mes": dict(agrupar=["Operador", "Locación", "Parámetro"], periodo="Mes"),
+    "parámetro × semana (cloro)": dict(agrupar=["Parámetro"], periodo="Semana",
+                                       filtros={"Parámetro": ["Cloro Residual (mg/L)"]}),
+    "locación × parámetro × día (30 d)": dict(agrupar=["Locación", "Parámetro"], periodo="Día", desde="hoy-30"),
+    "total por parámetro": dict(agrupar=["Parámetro"]),
+}
+
+
+def _mediana_ms(funcion, repeticiones: int) -> tuple:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return resultado, float(np.median(tiempos))
+
+
+def main(argv: list = None) -> int:
+    from ptap_dashboard import LIMITES
+    from ptap_simulacion import generar_muestras
+
+    parser = argparse.ArgumentParser(description="Latencia del motor analítico sobre datos sintéticos.")
+    parser.add_argument("--filas", type=lambda t: [int(x) for x in t.split(",") if x], default=[1000000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for filas in args.filas:
+        df = generar_muestras(filas)
+        t0 = time.perf_counter()
+        motor = MotorAnalisis(df, LIMITES)
+        print(f"\n{filas:,} muestras → {len(motor):,} mediciones en {motor.grupos_diarios:,} grupos diarios "
+              f"· carga {time.perf_counter() - t0:.1f}s")
+        for nombre, consulta in CONSULTAS.items():
+            consulta = dict(consulta)
+            if consulta.get("desde") == "hoy-30":
+                consulta["desde"] = motor.hasta - pd.Timedelta(days=30)
+            resultado, ms = _mediana_ms(lambda: motor.consultar(**consulta), args.repeticiones)
+            print(f"  {nombre:<38} {len(resultado):>6} grupos {ms:>8.1f} ms", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - API REST de solo lectura                                ║
+║  KPIs, alertas, muestras y cumplimiento para otros sistemas     ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Servicio HTTP sin interfaz que reutiliza las funciones de análisis del
+dashboard. Las respuestas se cachean por versión de datos y llevan ``ETag``;
+un cliente que envía ``If-None-Match`` con la etiqueta vigente recibe ``304``
+sin cuerpo (ideal para pollers SCADA).
+
+    python ptap_api.py --puerto 8080
+    python ptap_api.py --csv respaldo.csv --ttl 30
+
+Endpoints (GET/HEAD):
+    /kpis        ?dias=7
+    /alerts      ?horas=48
+    /samples     ?locacion=&operador=&desde=YYYY-MM-DD&hasta=YYYY-MM-DD&pagina=1&por_pagina=100
+    /compliance  ?dias=30
+"""
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import ptap_dashboard as app
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+TTL_DATOS = 60          # segundos entre relecturas del backend
+TTL_RESPUESTA = 60      # vigencia de una respuesta cacheada (KPIs dependen de la hora)
+POR_PAGINA_MAX = 1000
+DIAS_MAX = 3650         # ventanas de hasta 10 años
+HORAS_MAX = 24 * DIAS_MAX
+ALERTAS_KPIS = 10       # /kpis solo trae las más recientes; el listado completo está en /alerts
+PARAMS = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
+COLUMNAS_MUESTRA = ["Fecha", "Hora de Toma", "Operador", "Locación", *PARAMS, "Observaciones"]
+
+
+class ErrorConsulta(ValueError):
+    """Parámetro de consulta inválido (responde 400)."""
+
+
+# ═══════════════════════════════════════════════════════════════
+# DATOS Y CACHÉ
+# ═══════════════════════════════════════════════════════════════
+class FuenteDatos:
+    """Mantiene el DataFrame vigente y su versión; solo un hilo relee a la vez."""
+
+    def __init__(self, csv: str = None, ttl: int = TTL_DATOS):
+        self.csv = csv
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._df = pd.DataFrame()
+        self._version = "vacio"
+        self._leido = 0.0
+
+    def _leer(self) -> pd.DataFrame:
+        if self.csv:
+            return app.procesar_registros(pd.read_csv(self.csv, dtype=str, keep_default_na=False))
+        return app.leer_datos()
+
+    def obtener(self) -> tuple:
+        """Retorna ``(df, version)``, releyendo si el snapshot venció."""
+        if time.monotonic() - self._leido < self.ttl:
+            return self._df, self._version
+        with self._lock:
+            if time.monotonic() - self._leido >= self.ttl:
+                df = self._leer()
+                if not df.empty or self._df.empty:
+                    self._df, self._version = df, app.version_datos(df)
+                self._leido = time.monotonic()
+        return self._df, self._version
+
+
+class CacheRespuestas:
+    """Cuerpos JSON ya serializados por (versión, ruta, consulta)."""
+
+    def __init__(self, ttl: int = TTL_RESPUESTA):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._entradas = {}
+
+    def obtener(self, version: str, clave: tuple):
+        with self._lock:
+            if version != self._version:
+                self._version, self._entradas = version, {}
+                return None
+            entrada = self._entradas.get(clave)
+        if entrada and time.monotonic() - entrada[2] < self.ttl:
+            return entrada
+        return None
+
+    def guardar(self, version: str, clave: tuple, cuerpo: bytes) -> tuple:
+        etag = f'"{version}-{hashlib.sha1(cuerpo).hexdigest()[:12]}"'
+        entrada = (etag, cuerpo, time.monotonic())
+        with self._lock:
+            if version == self._version:
+                self._entradas[clave] = entrada
+        return entrada
+
+
+def _a_json(obj):
+    """Serializa tipos de pandas/numpy; NaN y NaT se publican como null."""
+    if isinstance(obj, dict):
+        return {str(k): _a_json(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_a_json(v) for v in obj]
+    if obj is None or obj is pd.NaT:
+        return None
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        obj = obj.item()
+    if isinstance(obj, float) and math.isnan(obj):
+        return None
+    return obj
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENDPOINTS
+# ═══════════════════════════════════════════════════════════════
+def _entero(q: dict, nombre: str, defecto: int, minimo: int = 1, maximo: int = None) -> int:
+    try:
+        valor = int(q.get(nombre, defecto))
+    except ValueError:
+        raise ErrorConsulta(f"'{nombre}' debe ser un entero")
+    if valor < minimo or (maximo is not None and valor > maximo):
+        raise ErrorConsulta(f"'{nombre}' fuera de rango")
+    return valor
+
+
+def _fecha(q: dict, nombre: str):
+    if not q.get(nombre):
+        return None
+    try:
+        return pd.Timestamp(datetime.strptime(q[nombre], "%Y-%m-%d"))
+    except ValueError:
+        raise ErrorConsulta(f"'{nombre}' debe tener formato YYYY-MM-DD")
+
+
+def _ventana(df: pd.DataFrame, dias: int) -> pd.DataFrame:
+    return df[df["Fecha_Hora"] >= datetime.now() - timedelta(days=dias)]
+
+
+def endpoint_kpis(df: pd.DataFrame, q: dict) -> dict:
+    dias = _entero(q, "dias", 7, maximo=DIAS_MAX)
+    resumen = app.resumen_ejecutivo(df, dias)
+    # resumen_ejecutivo trae todas las alertas de la ventana (para el feed paginado del dashboard)
+    resumen["alertas_detalle"] = resumen["alertas_detalle"][:ALERTAS_KPIS]
+    resumen["dias"] = dias
+    return resumen
+
+
+def endpoint_alerts(df: pd.DataFrame, q: dict) -> dict:
+    horas = _entero(q, "horas", 48, maximo=HORAS_MAX)
+    alertas = app.generar_alertas(df, horas=horas)
+    return {"horas": horas, "total": len(alertas), "alertas": alertas}
+
+
+def endpoint_samples(df: pd.DataFrame, q: dict) -> dict:
+    pagina = _entero(q, "pagina", 1)
+    por_pagina = _entero(q, "por_pagina", 100, maximo=POR_PAGINA_MAX)
+    desde, hasta = _fecha(q, "desde"), _fecha(q, "hasta")
+
+    mask = pd.Series(True, index=df.index)
+    if q.get("locacion"):
+        mask &= df["Locación"] == q["locacion"]
+    if q.get("operador"):
+        mask &= df["Operador"] == q["operador"]
+    if desde is not None:
+        mask &= df["Fecha_dt"] >= desde
+    if hasta is not None:
+        mask &= df["Fecha_dt"] <= hasta
+
+    filtrado = df.loc[mask]
+    total = len(filtrado)
+    inicio = (pagina - 1) * por_pagina
+    orden = filtrado["Fecha_Hora"].sort_values(ascending=False, kind="stable").index
+    pagina_df = filtrado.loc[orden[inicio:inicio + por_pagina]]
+    cols = [c for c in COLUMNAS_MUESTRA if c in pagina_df.columns]
+    return {
+        "total": total,
+        "pagina": pagina,
+        "por_pagina": por_pagina,
+        "paginas": max(1, math.ceil(total / por_pagina)),
+        "datos": pagina_df[cols].to_dict(orient="records"),
+    }
+
+
+def endpoint_compliance(df: pd.DataFrame, q: dict) -> dict:
+    dias = _entero(q, "dias", 30, maximo=DIAS_MAX)
+    reciente = _ventana(df, dias)
+    por_locacion = {}
+    for loc in sorted(reciente["Locación"].dropna().unique()):
+        sub = reciente[reciente["Locación"] == loc]
+        params = ["Cloro Residual (mg/L)"] if str(loc).strip().lower() in app.SOLO_CLORO else PARAMS
+        por_locacion[loc] = {p: app.calcular_cumplimiento(sub, p) for p in params}
+    return {
+        "dias": dias,
+        "global": {p: app.calcular_cumplimiento(reciente, p) for p in PARAMS},
+        "locaciones": por_locacion,
+    }
+
+
+ENDPOINTS = {
+    "/kpis": endpoint_kpis,
+    "/alerts": endpoint_alerts,
+    "/samples": endpoint_samples,
+    "/compliance": endpoint_compliance,
+}
+
+
+# ═══════════════════════════════════════════════════════════════
+# SERVIDOR HTTP
+# ═══════════════════════════════════════════════════════════════
+class ManejadorAPI(BaseHTTPRequestHandler):
+    fuente: FuenteDatos = None
+    cache: CacheRespuestas = None
+    server_version = "PTAP-API/1.0"
+
+    def _enviar(self, estado: int, cuerpo: bytes = b"", etag: str = None, con_cuerpo: bool = True):
+        self.send_response(estado)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if estado != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if con_cuerpo and estado != 304:
+            self.wfile.write(cuerpo)
+
+    def _error(self, estado: int, mensaje: str, con_cuerpo: bool = True):
+        self._enviar(estado, json.dumps({"error": mensaje}).encode("utf-8"), con_cuerpo=con_cuerpo)
+
+    def _responder(self, con_cuerpo: bool):
+        url = urlsplit(self.path)
+        endpoint = ENDPOINTS.get(url.path.rstrip("/") or "/")
+        if endpoint is None:
+            return self._error(404, f"ruta desconocida: {url.path}", con_cuerpo)
+
+        q = dict(parse_qsl(url.query))
+        try:
+            df, version = self.fuente.obtener()
+            clave = (url.path, tuple(sorted(q.items())))
+            entrada = self.cache.obtener(version, clave)
+            if entrada is None:
+                datos = endpoint(df, q) if not df.empty else {}
+                cuerpo = json.dumps(_a_json(datos), ensure_ascii=False).encode("utf-8")
+                entrada = self.cache.guardar(version, clave, cuerpo)
+        except ErrorConsulta as e:
+            return self._error(400, str(e), con_cuerpo)
+        except Exception as e:
+            # Sin esto el cliente solo ve la conexión cerrada
+            self.log_error("error en %s: %r", url.path, e)
+            return self._error(500, f"error interno: {type(e).__name__}", con_cuerpo)
+
+        etag, cuerpo, _ = entrada
+        etiquetas = {e.strip() for e in self.headers.get("If-None-Match", "").split(",")}
+        if etag in etiquetas or "*" in etiquetas:
+            return self._enviar(304, etag=etag)
+        self._enviar(200, cuerpo, etag=etag, con_cuerpo=con_cuerpo)
+
+    def do_GET(self):
+        self._responder(con_cuerpo=True)
+
+    def do_HEAD(self):
+        self._responder(con_cuerpo=False)
+
+
+def crear_servidor(host: str, puerto: int, fuente: FuenteDatos, cache: CacheRespuestas = None) -> ThreadingHTTPServer:
+    manejador = type("Manejador", (ManejadorAPI,), {"fuente": fuente, "cache": cache or CacheRespuestas()})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="API REST de solo lectura del sistema PTAP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--csv", help="Servir un respaldo CSV en lugar de Google Sheets")
+    parser.add_argument("--ttl", type=int, default=TTL_DATOS, help="Segundos entre relecturas del backend")
+    args = parser.parse_args(argv)
+
+    servidor = crear_servidor(args.host, args.puerto, FuenteDatos(args.csv, args.ttl))
+    print(f"PTAP API escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
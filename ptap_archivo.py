@@ -0,0 +1,212 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Archivo histórico particionado por mes                  ║
+║  Parquet comprimido + manifiesto con estadísticas min/max       ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Las muestras más antiguas que ``--edad`` días se compactan en una partición
+Parquet (zstd) por mes. El manifiesto guarda, por partición, filas, rango de
+``Fecha_Hora``, locaciones y operadores; las lecturas solo abren las
+particiones cuyo rango se solapa con la ventana pedida.
+
+    python ptap_archivo.py --edad 90              # compacta, sin tocar el Sheet
+    python ptap_archivo.py --edad 90 --purgar     # compacta y elimina del Sheet lo archivado
+
+Con ``--purgar`` el Google Sheet (tier caliente) queda con los últimos meses.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+DIR_ARCHIVO = Path(os.environ.get("PTAP_ARCHIVO", "datos_locales/archivo"))
+EDAD_ARCHIVO_DIAS = 90
+COLS_CLAVE = ["Fecha", "Hora de Toma", "Hora de Registro", "Operador", "Locación"]
+COLS_DERIVADAS = ["Fecha_dt", "Fecha_Hora"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# MANIFIESTO
+# ═══════════════════════════════════════════════════════════════
+def _ruta_manifiesto(directorio: Path) -> Path:
+    return Path(directorio) / "manifiesto.json"
+
+
+def leer_manifiesto(directorio: Path = DIR_ARCHIVO) -> dict:
+    """``{YYYY-MM: {archivo, filas, min, max, locaciones, operadores}}``; vacío si no hay archivo."""
+    ruta = _ruta_manifiesto(directorio)
+    if not ruta.exists():
+        return {}
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+def version_manifiesto(manifiesto: dict) -> str:
+    """Huella del manifiesto; cambia cada vez que se reescribe una partición."""
+    return hashlib.sha1(json.dumps(manifiesto, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def _escribir_atomico(ruta: Path, escribir):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=ruta.parent, prefix=".tmp-")
+    os.close(fd)
+    try:
+        escribir(tmp)
+        os.replace(tmp, ruta)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def _guardar_manifiesto(directorio: Path, manifiesto: dict):
+    texto = json.dumps(manifiesto, ensure_ascii=False, indent=1, sort_keys=True)
+    _escribir_atomico(_ruta_manifiesto(directorio), lambda tmp: Path(tmp).write_text(texto, encoding="utf-8"))
+
+
+def particiones_en_rango(manifiesto: dict, desde=None, hasta=None) -> list:
+    """Meses cuyo rango [min, max] se solapa con [desde, hasta] (extremos opcionales)."""
+    meses = []
+    for mes, p in sorted(manifiesto.items()):
+        if hasta is not None and pd.Timestamp(p["min"]) > pd.Timestamp(hasta):
+            continue
+        if desde is not None and pd.Timestamp(p["max"]) < pd.Timestamp(desde):
+            continue
+        meses.append(mes)
+    return meses
+
+
+# ═══════════════════════════════════════════════════════════════
+# LECTURA
+# ═══════════════════════════════════════════════════════════════
+def leer_archivo(desde=None, hasta=None, directorio: Path = DIR_ARCHIVO) -> pd.DataFrame:
+    """Lee solo las particiones que se solapan con la ventana y recorta a [desde, hasta]."""
+    directorio = Path(directorio)
+    manifiesto = leer_manifiesto(directorio)
+    partes = [pq.read_table(directorio / manifiesto[m]["archivo"]).to_pandas()
+              for m in particiones_en_rango(manifiesto, desde, hasta)]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    if desde is not None:
+        df = df[df["Fecha_Hora"] >= pd.Timestamp(desde)]
+    if hasta is not None:
+        df = df[df["Fecha_Hora"] <= pd.Timestamp(hasta)]
+    return df.reset_index(drop=True)
+
+
+# ═══════════════════════════════════════════════════════════════
+# COMPACTACIÓN
+# ═══════════════════════════════════════════════════════════════
+def _normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    """Columnas de texto homogéneas para Parquet (el Sheet mezcla números y texto)."""
+    df = df.copy()
+    for col in df.columns:
+        if col not in COLS_DERIVADAS and df[col].dtype == object:
+            df[col] = df[col].astype(str)
+    return df
+
+
+def _deduplicar(df: pd.DataFrame) -> pd.DataFrame:
+    clave = [c for c in COLS_CLAVE if c in df.columns]
+    return df.drop_duplicates(subset=clave or None, keep="last")
+
+
+def compactar(df: pd.DataFrame, edad_dias: int = EDAD_ARCHIVO_DIAS,
+              directorio: Path = DIR_ARCHIVO, ahora: datetime = None) -> pd.DataFrame:
+    """
+    Escribe en particiones mensuales las muestras con ``Fecha_Hora`` anterior a
+    ``ahora - edad_dias``, fusionando con lo ya archivado. Retorna las filas archivadas.
+    """
+    directorio = Path(directorio)
+    corte = (ahora or datetime.now()) - timedelta(days=edad_dias)
+    viejas = df[df["Fecha_Hora"] < corte]
+    if viejas.empty:
+        return viejas
+
+    manifiesto = leer_manifiesto(directorio)
+    viejas = _normalizar(viejas)
+    for periodo, grupo in viejas.groupby(viejas["Fecha_Hora"].dt.to_period("M")):
+        mes = periodo.strftime("%Y-%m")
+        archivo = f"mes={mes}/muestras.parquet"
+        ruta = directorio / archivo
+        if ruta.exists():
+            grupo = pd.concat([pq.read_table(ruta).to_pandas(), grupo], ignore_index=True)
+        grupo = _deduplicar(grupo).sort_values("Fecha_Hora").reset_index(drop=True)
+
+        tabla = pa.Table.from_pandas(grupo, preserve_index=False)
+        _escribir_atomico(ruta, lambda tmp: pq.write_table(tabla, tmp, compression="zstd"))
+        manifiesto[mes] = {
+            "archivo": archivo,
+            "filas": len(grupo),
+            "min": grupo["Fecha_Hora"].min().isoformat(),
+            "max": grupo["Fecha_Hora"].max().isoformat(),
+            "locaciones": sorted(grupo["Locación"].dropna().unique().tolist()),
+            "operadores": sorted(grupo["Operador"].dropna().unique().tolist()),
+        }
+    _guardar_manifiesto(directorio, manifiesto)
+    return viejas
+
+
+def purgar_hoja(ws, archivadas: pd.DataFrame) -> int:
+    """
+    Elimina del worksheet las filas ya archivadas. Las posiciones se recalculan
+    sobre una lectura fresca (por clave natural) y se borran en rangos, de abajo
+    hacia arriba, para que los índices no se desplacen.
+    """
+    valores = ws.get_all_values()
+    if len(valores) < 2 or archivadas.empty:
+        return 0
+    encabezados = valores[0]
+    idx = [encabezados.index(c) for c in COLS_CLAVE if c in encabezados]
+    claves = set(archivadas[[encabezados[i] for i in idx]].astype(str).itertuples(index=False, name=None))
+
+    filas = [n + 2 for n, fila in enumerate(valores[1:])
+             if tuple(str(fila[i]) if i < len(fila) else "" for i in idx) in claves]
+    rangos = []
+    for n in filas:
+        if rangos and rangos[-1][1] == n - 1:
+            rangos[-1][1] = n
+        else:
+            rangos.append([n, n])
+    for inicio, fin in reversed(rangos):
+        ws.delete_rows(inicio, fin)
+    return len(filas)
+
+
+def main(argv: list = None) -> int:
+    import ptap_dashboard as app
+
+    parser = argparse.ArgumentParser(description="Compacta muestras antiguas en particiones Parquet mensuales.")
+    parser.add_argument("--planta", choices=list(app.PLANTAS), default=app.PLANTA_DEFECTO,
+                        help="Planta cuyo Sheet y archivo histórico se procesan")
+    parser.add_argument("--edad", type=int, default=EDAD_ARCHIVO_DIAS, help="Archivar muestras con más de N días")
+    parser.add_argument("--directorio", default=None,
+                        help="Directorio del archivo (por defecto, el de la planta)")
+    parser.add_argument("--purgar", action="store_true", help="Eliminar del Google Sheet las filas archivadas")
+    args = parser.parse_args(argv)
+    directorio = Path(args.directorio) if args.directorio else Path(app.directorio_archivo(args.planta))
+
+    df = app.leer_datos(args.planta)
+    if df.empty:
+        print("No hay datos en el tier caliente.", file=sys.stderr)
+        return 1
+    archivadas = compactar(df, args.edad, directorio)
+    print(f"Archivadas {len(archivadas)} muestras en {directorio}")
+    if args.purgar and not archivadas.empty:
+        ws = app.get_worksheet(app.PLANTAS[args.planta]["sheet_url"])
+        print(f"Eliminadas {purgar_hoja(ws, archivadas)} filas del Google Sheet")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
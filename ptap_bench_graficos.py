@@ -0,0 +1,199 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Benchmark de payload de los gráficos                    ║
+║  Arreglos binarios (float32 + epoch) vs. listas JSON            ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Mide, sobre datasets sintéticos grandes, el tamaño del JSON que Streamlit
+envía al navegador por cada figura y el tiempo de serializarlo, comparando:
+
+- antes:  listas de float64 y un string ISO por cada fecha
+- ahora:  ``{"dtype": "f4" | "f8", "bdata": <base64>}`` (Plotly >= 6)
+
+Para una locación con medición completa compara además las tres figuras por
+parámetro (una por pH, Turbidez y Cloro) contra la figura única con subplots
+de eje compartido: costo de construirla, bytes y tiempo de serialización.
+
+El tiempo de render en el navegador se mide abriendo el HTML generado con
+``--html``: dibuja cada payload con ``Plotly.newPlot`` y muestra los tiempos.
+
+    python ptap_bench_graficos.py --filas 10000,100000,500000
+    python ptap_bench_graficos.py --filas 100000 --html bench_graficos.html
+"""
+import argparse
+import gzip
+import html
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import ptap_dashboard as app
+from ptap_simulacion import ENCABEZADOS, generar_filas
+
+FIGURAS = {
+    "parametro (pH)": lambda df: app.crear_grafico_parametro(df, "pH"),
+    "tendencia (cloro)": lambda df: app.crear_grafico_tendencia_global(df, "Cloro Residual (mg/L)"),
+    "heatmap": lambda df: app.crear_heatmap_cumplimiento(df, dias=9999),
+}
+LOCACION = "Planta de Agua Potable"
+PARAMS_COMPLETOS = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# PAYLOADS
+# ═══════════════════════════════════════════════════════════════
+def datos_sinteticos(filas: int) -> pd.DataFrame:
+    registros = [dict(zip(ENCABEZADOS, f)) for f in generar_filas(filas, dias=365)]
+    return app.procesar_registros(pd.DataFrame(registros))
+
+
+def payload_listas(fig) -> str:
+    """JSON como lo emitía la ruta anterior: listas float64 y fechas ISO por punto."""
+    figura = fig.to_plotly_json()
+    eje_fecha = figura["layout"].get("xaxis", {}).get("type") == "date"
+    for traza, original in zip(figura["data"], fig.data):
+        for eje in ("x", "y", "z"):
+            valores = original[eje] if eje in original else None
+            if not isinstance(valores, np.ndarray) or valores.dtype.kind != "f":
+                continue
+            if eje == "x" and eje_fecha:
+                traza[eje] = pd.to_datetime(valores, unit="ms").strftime("%Y-%m-%dT%H:%M:%S").tolist()
+            else:
+                # Redondeo a 4 decimales: cota inferior del tamaño real (los promedios llevaban 17 dígitos)
+                traza[eje] = np.round(valores.astype(np.float64), 4).tolist()
+    return pio.to_json(figura, validate=False)
+
+
+def payload_binario(fig) -> str:
+    """JSON que envía ``st.plotly_chart`` con la ruta actual."""
+    return pio.to_json(fig, validate=False)
+
+
+def _medir(funcion, fig) -> tuple:
+    t0 = time.perf_counter()
+    texto = funcion(fig)
+    return texto, (time.perf_counter() - t0) * 1000
+
+
+def figuras_locacion(df: pd.DataFrame) -> dict:
+    """``{caso: lista de figuras}`` de ``LOCACION``: tres por parámetro vs. una con subplots."""
+    df_loc = df[df["Locación"] == LOCACION].sort_values("Fecha_Hora")
+    return {
+        "3 figuras": lambda: [app.crear_grafico_parametro(df_loc, p) for p in PARAMS_COMPLETOS],
+        "1 figura (subplots)": lambda: [app.crear_grafico_locacion(df_loc, PARAMS_COMPLETOS)],
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# RENDER EN NAVEGADOR
+# ═══════════════════════════════════════════════════════════════
+PLANTILLA_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>PTAP · render de gráficos</title>
+<script>{plotlyjs}</script></head>
+<body style="font-family: sans-serif">
+<h3>Render de gráficos: listas JSON vs. arreglos binarios</h3>
+<pre id="resultado">Midiendo…</pre>
+<div id="lienzo" style="width: 1000px"></div>
+{payloads}
+<script>
+(async () => {{
+  const filas = ["caso                                   bytes    parse ms   render ms"];
+  const lienzo = document.getElementById("lienzo");
+  for (const nodo of document.querySelectorAll("script[data-caso]")) {{
+    const tiempos = [];
+    let parse = 0;
+    for (let i = 0; i < {repeticiones}; i++) {{
+      const t0 = performance.now();
+      const figs = [].concat(JSON.parse(nodo.textContent));
+      const t1 = performance.now();
+      for (const fig of figs) {{
+        await Plotly.newPlot(lienzo.appendChild(document.createElement("div")), fig.data, fig.layout);
+      }}
+      tiempos.push(performance.now() - t1);
+      parse += t1 - t0;
+      for (const div of [...lienzo.children]) {{ Plotly.purge(div); div.remove(); }}
+    }}
+    tiempos.sort((a, b) => a - b);
+    filas.push(nodo.dataset.caso.padEnd(36) + String(nodo.textContent.length).padStart(10)
+      + (parse / tiempos.length).toFixed(1).padStart(12) + tiempos[tiempos.length >> 1].toFixed(1).padStart(12));
+    document.getElementById("resultado").textContent = filas.join("\\n");
+  }}
+}})();
+</script></body></html>
+"""
+
+
+def escribir_html(ruta: str, payloads: list, repeticiones: int = 5):
+    """
+    HTML autónomo que mide parse + ``Plotly.newPlot`` (mediana) de cada payload.
+    Un payload puede ser un arreglo JSON de figuras (se dibujan todas).
+    """
+    bloques = "\n".join(
+        '<script type="application/json" data-caso="%s">%s</script>' % (html.escape(caso), texto.replace("</", "<\\/"))
+        for caso, texto in payloads
+    )
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(PLANTILLA_HTML.format(plotlyjs=get_plotlyjs(), payloads=bloques, repeticiones=repeticiones))
+
+
+# ═══════════════════════════════════════════════════════════════
+# CLI
+# ═══════════════════════════════════════════════════════════════
+def _lista_enteros(texto: str) -> list:
+    return [int(x) for x in texto.split(",") if x]
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Tamaño y costo de serialización de los gráficos del dashboard.")
+    parser.add_argument("--filas", type=_lista_enteros, default=[10000, 100000])
+    parser.add_argument("--html", help="Escribir un HTML para medir el render en el navegador")
+    args = parser.parse_args(argv)
+
+    encabezado = (f"{'filas':>8} {'figura':<18} {'antes KB':>9} {'ahora KB':>9} {'ratio':>6} "
+                  f"{'gzip antes':>10} {'gzip ahora':>10} {'json antes ms':>13} {'json ahora ms':>13}")
+    print(encabezado)
+    print("─" * len(encabezado))
+    para_html = []
+    datos_por_filas = []
+    for filas in args.filas:
+        df = datos_sinteticos(filas)
+        for nombre, crear in FIGURAS.items():
+            fig = crear(df)
+            antes, t_antes = _medir(payload_listas, fig)
+            ahora, t_ahora = _medir(payload_binario, fig)
+            b_antes, b_ahora = len(antes.encode()), len(ahora.encode())
+            print(f"{filas:>8} {nombre:<18} {b_antes / 1024:>9.0f} {b_ahora / 1024:>9.0f} "
+                  f"{b_antes / b_ahora:>5.1f}x {len(gzip.compress(antes.encode())) / 1024:>10.0f} "
+                  f"{len(gzip.compress(ahora.encode())) / 1024:>10.0f} {t_antes:>13.0f} {t_ahora:>13.0f}", flush=True)
+            para_html += [(f"{filas} {nombre} · antes", antes), (f"{filas} {nombre} · ahora", ahora)]
+        datos_por_filas.append((filas, df))
+
+    encabezado = (f"{'filas':>8} {'locación: ' + LOCACION:<34} {'figuras':>7} {'KB':>7} {'gzip KB':>8} "
+                  f"{'crear ms':>9} {'json ms':>8} {'shapes':>7}")
+    print("\n" + encabezado)
+    print("─" * len(encabezado))
+    for filas, df in datos_por_filas:
+        for caso, crear in figuras_locacion(df).items():
+            t0 = time.perf_counter()
+            figs = crear()
+            t_crear = (time.perf_counter() - t0) * 1000
+            partes, t_json = zip(*(_medir(payload_binario, f) for f in figs))
+            texto = "[" + ",".join(partes) + "]"
+            shapes = sum(len(f.layout.shapes) for f in figs)
+            print(f"{filas:>8} {caso:<34} {len(figs):>7} {len(texto.encode()) / 1024:>7.0f} "
+                  f"{len(gzip.compress(texto.encode())) / 1024:>8.0f} {t_crear:>9.0f} {sum(t_json):>8.0f} "
+                  f"{shapes:>7}", flush=True)
+            para_html.append((f"{filas} {caso}", texto))
+
+    if args.html:
+        escribir_html(args.html, para_html)
+        print(f"\nAbrir {args.html} en un navegador para medir el render.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Caché compartida entre réplicas                         ║
+║  Un archivo SQLite en el host, visible para todos los procesos  ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Las réplicas del servidor publican aquí el DataFrame ya procesado (snapshot)
+y agregados derivados. Un bloqueo con vencimiento (lease) garantiza que solo
+una réplica relea Google Sheets a la vez; las demás sirven el snapshot vigente
+(o el anterior, mientras se refresca) sin tocar el backend.
+
+Prueba con varios procesos locales:
+
+    python ptap_cache.py --procesos 8 --latencia 0.5
+"""
+import argparse
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+DB_CACHE = Path(os.environ.get("PTAP_CACHE_DB", "datos_locales/cache.sqlite"))
+TTL_SNAPSHOT = 60        # segundos antes de releer el backend
+DURACION_LEASE = 120     # vencimiento del bloqueo si la réplica que refresca muere
+ESPERA_MAXIMA = 30       # cuánto espera una réplica sin snapshot a que otra publique
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    clave TEXT PRIMARY KEY, version TEXT NOT NULL, publicado REAL NOT NULL, datos BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS derivados (
+    clave TEXT NOT NULL, version TEXT NOT NULL, creado REAL NOT NULL, datos BLOB NOT NULL,
+    PRIMARY KEY (clave, version)
+);
+CREATE TABLE IF NOT EXISTS bloqueos (
+    nombre TEXT PRIMARY KEY, dueno TEXT NOT NULL, expira REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS errores (
+    clave TEXT PRIMARY KEY, origen TEXT NOT NULL, mensaje TEXT NOT NULL, momento REAL NOT NULL
+);
+"""
+
+
+class CacheCompartida:
+    """Snapshots y agregados publicados una vez y leídos por todas las réplicas."""
+
+    def __init__(self, ruta: Path = DB_CACHE, ttl: float = TTL_SNAPSHOT):
+        self.ruta = Path(ruta)
+        self.ttl = ttl
+        self.dueno = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._memo = {}  # clave -> (version, objeto) ya deserializado en este proceso
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._db().executescript(ESQUEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        """Una conexión por hilo (Streamlit atiende cada sesión en su propio hilo)."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    # ── Bloqueo de refresco ──────────────────────────────────
+    def adquirir(self, nombre: str, duracion: float = DURACION_LEASE) -> bool:
+        """Toma el lease ``nombre`` si está libre, vencido o ya es nuestro."""
+        db = self._db()
+        ahora = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            fila = db.execute("SELECT dueno, expira FROM bloqueos WHERE nombre = ?", (nombre,)).fetchone()
+            if fila and fila[0] != self.dueno and fila[1] > ahora:
+                db.execute("COMMIT")
+                return False
+            db.execute("INSERT OR REPLACE INTO bloqueos VALUES (?, ?, ?)", (nombre, self.dueno, ahora + duracion))
+            db.execute("COMMIT")
+            return True
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def liberar(self, nombre: str):
+        self._db().execute("DELETE FROM bloqueos WHERE nombre = ? AND dueno = ?", (nombre, self.dueno))
+
+    # ── Snapshots ────────────────────────────────────────────
+    def leer_snapshot(self, clave: str):
+        """
+        ``(objeto, version, publicado)`` o ``None`` si nunca se publicó. El blob
+        solo se lee y deserializa cuando la versión publicada cambió.
+        """
+        db = self._db()
+        while True:
+            fila = db.execute("SELECT version, publicado FROM snapshots WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            version, publicado = fila
+            memo = self._memo.get(clave)
+            if memo is not None and memo[0] == version:
+                return memo[1], version, publicado
+            # El blob se pide por (clave, versión): si otra réplica publicó entre
+            # ambas lecturas no hay fila y se vuelve a empezar con la versión nueva
+            fila = db.execute("SELECT datos, publicado FROM snapshots WHERE clave = ? AND version = ?",
+                              (clave, version)).fetchone()
+            if fila is not None:
+                memo = (version, pickle.loads(fila[0]))
+                self._memo[clave] = memo
+                return memo[1], version, fila[1]
+
+    def publicar_snapshot(self, clave: str, objeto, version: str):
+        datos = pickle.dumps(objeto, protocol=pickle.HIGHEST_PROTOCOL)
+        self._db().execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                           (clave, version, time.time(), datos))
+        self._memo[clave] = (version, objeto)
+
+    def invalidar(self, clave: str):
+        """Marca el snapshot como vencido; la próxima lectura lo refresca."""
+        self._db().execute("UPDATE snapshots SET publicado = 0 WHERE clave = ?", (clave,))
+
+    def _vigente(self, snap) -> bool:
+        return snap is not None and time.time() - snap[2] < self.ttl
+
+    def obtener_snapshot(self, clave: str, cargar, versionar) -> tuple:
+        """
+        Retorna ``(objeto, version)``. Si el snapshot venció, una sola réplica
+        ejecuta ``cargar()`` y publica; las demás siguen con el snapshot anterior
+        o, si no hay ninguno, esperan a que se publique.
+        """
+        lease = f"refresco:{clave}"
+        limite = time.monotonic() + ESPERA_MAXIMA
+        while True:
+            snap = self.leer_snapshot(clave)
+            if self._vigente(snap):
+                return snap[0], snap[1]
+            if self.adquirir(lease):
+                try:
+                    snap = self.leer_snapshot(clave)
+                    if self._vigente(snap):
+                        return snap[0], snap[1]
+                    try:
+                        objeto = cargar()
+                    except Exception:
+                        if snap is None:
+                            raise
+                        return snap[0], snap[1]
+                    version = versionar(objeto)
+                    self.publicar_snapshot(clave, objeto, version)
+                    return objeto, version
+                finally:
+                    self.liberar(lease)
+            # Otra réplica está refrescando
+            if snap is not None:
+                return snap[0], snap[1]
+            if time.monotonic() > limite:
+                objeto = cargar()
+                return objeto, versionar(objeto)
+            time.sleep(0.1)
+
+    # ── Agregados derivados ──────────────────────────────────
+    def derivado(self, clave: str, version: str, calcular, ttl: float = None):
+        """
+        Resultado de ``calcular()`` para (clave, versión de datos), calculado por
+        la primera réplica que lo pide. ``ttl`` acota agregados que dependen de la hora.
+        """
+        db = self._db()
+        fila = db.execute("SELECT datos, creado FROM derivados WHERE clave = ? AND version = ?",
+                          (clave, version)).fetchone()
+        if fila is not None and (ttl is None or time.time() - fila[1] < ttl):
+            return pickle.loads(fila[0])
+        resultado = calcular()
+        db.execute("DELETE FROM derivados WHERE clave = ? AND version != ?", (clave, version))
+        db.execute("INSERT OR REPLACE INTO derivados VALUES (?, ?, ?, ?)",
+                   (clave, version, time.time(), pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL)))
+        return resultado
+
+    # ── Errores de tareas en segundo plano ───────────────────
+    def registrar_error(self, clave: str, origen: str, mensaje: str):
+        """Guarda el último fallo de ``clave`` para mostrarlo en todas las réplicas."""
+        self._db().execute("INSERT OR REPLACE INTO errores VALUES (?, ?, ?, ?)",
+                           (clave, origen, mensaje, time.time()))
+
+    def limpiar_error(self, clave: str, origen: str):
+        """Borra el fallo de ``clave`` solo si lo registró el mismo ``origen``."""
+        self._db().execute("DELETE FROM errores WHERE clave = ? AND origen = ?", (clave, origen))
+
+    def ultimo_error(self, clave: str):
+        """``{"origen", "mensaje", "momento"}`` o ``None`` si no hay fallo vigente."""
+        fila = self._db().execute("SELECT origen, mensaje, momento FROM errores WHERE clave = ?",
+                                  (clave,)).fetchone()
+        return dict(zip(("origen", "mensaje", "momento"), fila)) if fila else None
+
+
+# ═══════════════════════════════════════════════════════════════
+# PRUEBA CON VARIOS PROCESOS
+# ═══════════════════════════════════════════════════════════════
+def _replica(ruta: str, latencia: float, listos, inicio) -> tuple:
+    """Proceso réplica: espera la largada y pide el snapshot a la vez que las demás."""
+    from ptap_simulacion import HojaSimulada, generar_filas
+
+    hoja = HojaSimulada(generar_filas(2000), latencia=latencia)
+    cache = CacheCompartida(ruta)
+    listos.put(os.getpid())
+    inicio.wait()
+    _, version = cache.obtener_snapshot("muestras", hoja.get_all_records, lambda obj: str(len(obj)))
+    return version, hoja.llamadas["get_all_records"]
+
+
+def main(argv: list = None) -> int:
+    import multiprocessing
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Varias réplicas pidiendo el mismo snapshot a la vez.")
+    parser.add_argument("--procesos", type=int, default=6)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Latencia simulada del Google Sheet (s)")
+    parser.add_argument("--rondas", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp, ctx.Manager() as manager:
+        ruta = str(Path(tmp) / "cache.sqlite")
+        for ronda in range(1, args.rondas + 1):
+            CacheCompartida(ruta).invalidar("muestras")
+            listos, inicio = manager.Queue(), manager.Event()
+            with ProcessPoolExecutor(args.procesos, mp_context=ctx) as pool:
+                futuros = [pool.submit(_replica, ruta, args.latencia, listos, inicio)
+                           for _ in range(args.procesos)]
+                for _ in range(args.procesos):
+                    listos.get()
+                t0 = time.perf_counter()
+                inicio.set()
+                resultados = [f.result() for f in futuros]
+                dt = time.perf_counter() - t0
+            lecturas = sum(r[1] for r in resultados)
+            versiones = {r[0] for r in resultados}
+            print(f"Ronda {ronda}: {args.procesos} réplicas, {lecturas} lectura(s) al backend, "
+                  f"{len(versiones)} versión(es) servida(s), {dt:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Detección de cambios por huella de fila                 ║
+║  Filas editadas, insertadas o borradas entre dos lecturas       ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Cada lectura del Sheet guarda una huella (hash de 64 bits) por fila, otra de
+su clave natural y una por bloque de filas. Al comparar dos lecturas, los
+bloques iguales del comienzo se saltan sin mirar fila por fila; el resto se
+resuelve por conjuntos de huellas:
+
+- una fila cuya huella existe en ambas lecturas no cambió (aunque se movió)
+- misma clave natural y distinto contenido: editada
+- clave solo en la lectura nueva: insertada; solo en la anterior: borrada
+
+Con eso se recalcula la versión de cada locación afectada; los agregados,
+alertas y gráficos de las demás locaciones siguen vigentes en la caché.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from ptap_archivo import COLS_CLAVE
+
+TAMANO_BLOQUE = 256
+
+
+def huellas_filas(df: pd.DataFrame, columnas: list = None) -> np.ndarray:
+    """Hash de 64 bits por fila (mismo cálculo que la versión de datos del dashboard)."""
+    if df.empty:
+        return np.empty(0, dtype=np.uint64)
+    return pd.util.hash_pandas_object(df if columnas is None else df[columnas], index=False).to_numpy()
+
+
+def huellas_bloques(huellas: np.ndarray, tamano: int = TAMANO_BLOQUE) -> np.ndarray:
+    """Una huella por bloque de ``tamano`` filas, sensible a la posición dentro del bloque."""
+    n_bloques = -(-len(huellas) // tamano)
+    relleno = np.zeros(n_bloques * tamano, dtype=np.uint64)
+    relleno[:len(huellas)] = huellas
+    pesos = np.arange(1, tamano + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over="ignore"):
+        return (relleno.reshape(n_bloques, tamano) * pesos).sum(axis=1, dtype=np.uint64)
+
+
+def _version_grupo(huellas: np.ndarray) -> str:
+    """Versión de un conjunto de filas: independiente del orden, cambia con cualquier fila."""
+    with np.errstate(over="ignore"):
+        return f"{int(huellas.sum(dtype=np.uint64)):016x}-{len(huellas)}"
+
+
+class Huellas:
+    """Huellas de una lectura: por fila, por clave natural, por bloque y por locación."""
+
+    def __init__(self, df: pd.DataFrame, tamano_bloque: int = TAMANO_BLOQUE):
+        self.tamano_bloque = tamano_bloque
+        self.filas = huellas_filas(df)
+        clave = [c for c in COLS_CLAVE if c in df.columns]
+        self.claves = huellas_filas(df, clave) if clave else self.filas
+        self.bloques = huellas_bloques(self.filas, tamano_bloque)
+        self.locacion_filas = (df["Locación"].astype(str).to_numpy(dtype=str) if "Locación" in df.columns
+                               else np.full(len(df), ""))
+        self.version = hashlib.sha1(self.filas.tobytes()).hexdigest()[:12] if len(df) else "vacio"
+        self._locaciones = None
+        self.cambios = None
+
+    def __len__(self) -> int:
+        return len(self.filas)
+
+    @property
+    def locaciones(self) -> dict:
+        """Versión por locación (se calcula completa solo si no hubo una lectura anterior)."""
+        if self._locaciones is None:
+            self._locaciones = self._versiones(np.unique(self.locacion_filas).tolist())
+        return self._locaciones
+
+    def _versiones(self, locaciones) -> dict:
+        return {loc: _version_grupo(self.filas[self.locacion_filas == loc]) for loc in locaciones}
+
+    def _prefijo_comun(self, anterior: "Huellas") -> int:
+        """Filas iniciales idénticas; compara bloques y solo baja a filas en el primer bloque distinto."""
+        n = min(len(self.bloques), len(anterior.bloques))
+        distintos = np.flatnonzero(self.bloques[:n] != anterior.bloques[:n])
+        inicio = int(distintos[0]) * self.tamano_bloque if distintos.size else n * self.tamano_bloque
+        inicio = min(inicio, len(self), len(anterior))
+        fin = min(inicio + self.tamano_bloque, len(self), len(anterior))
+        filas_distintas = np.flatnonzero(self.filas[inicio:fin] != anterior.filas[inicio:fin])
+        return inicio + (int(filas_distintas[0]) if filas_distintas.size else fin - inicio)
+
+    def comparar(self, anterior: "Huellas") -> dict:
+        """
+        Diferencias respecto de ``anterior``: posiciones ``editadas`` e ``insertadas``
+        (en esta lectura), ``borradas`` (en la anterior) y ``locaciones`` afectadas.
+        """
+        if anterior.tamano_bloque != self.tamano_bloque:
+            anterior.tamano_bloque = self.tamano_bloque
+            anterior.bloques = huellas_bloques(anterior.filas, self.tamano_bloque)
+        prefijo = self._prefijo_comun(anterior)
+
+        # Sufijo común (filas finales idénticas), acotado para no solaparse con el prefijo
+        m = min(len(self), len(anterior)) - prefijo
+        distintos = np.flatnonzero(self.filas[::-1][:m] != anterior.filas[::-1][:m])
+        sufijo = int(distintos[0]) if distintos.size else m
+
+        nuevas = np.arange(prefijo, len(self) - sufijo)
+        viejas = np.arange(prefijo, len(anterior) - sufijo)
+        # Filas que siguen existiendo con el mismo contenido (quizás en otra posición)
+        siguen = np.isin(self.filas[nuevas], anterior.filas[viejas])
+        seguian = np.isin(anterior.filas[viejas], self.filas[nuevas])
+        nuevas, viejas = nuevas[~siguen], viejas[~seguian]
+
+        misma_clave = np.isin(self.claves[nuevas], anterior.claves[viejas])
+        editadas, insertadas = nuevas[misma_clave], nuevas[~misma_clave]
+        borradas = viejas[~np.isin(anterior.claves[viejas], self.claves[nuevas])]
+
+        locaciones = set(self.locacion_filas[nuevas].tolist()) | set(anterior.locacion_filas[viejas].tolist())
+        return {"editadas": editadas, "insertadas": insertadas, "borradas": borradas, "locaciones": locaciones}
+
+    def actualizar(self, anterior: "Huellas") -> dict:
+        """
+        Compara con ``anterior`` y reutiliza sus versiones por locación: solo se
+        recalculan las de las locaciones afectadas. Retorna las diferencias.
+        """
+        cambios = self.comparar(anterior)
+        locaciones = dict(anterior.locaciones)
+        for loc, version in self._versiones(cambios["locaciones"]).items():
+            if version.endswith("-0"):
+                locaciones.pop(loc, None)
+            else:
+                locaciones[loc] = version
+        self._locaciones = locaciones
+        self.cambios = cambios
+        return cambios
@@ -0,0 +1,172 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Prueba de carga del dashboard                           ║
+║  N sesiones concurrentes contra un Google Sheet simulado        ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Cada sesión es un ``AppTest`` de Streamlit que navega entre Dashboard,
+Historial y Exportar cambiando período, locación y operador. Cada escenario
+(N sesiones × tamaño del dataset) corre en un proceso nuevo para que el pico de
+memoria y las cachés de Streamlit no se mezclen entre escenarios.
+
+    python ptap_carga.py --sesiones 1,5,10,20 --filas 1000,10000 --pasos 10
+    python ptap_carga.py --sesiones 10 --filas 50000 --latencia 0.3
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+RUTA_APP = str(Path(__file__).with_name("ptap_dashboard.py"))
+PAGINAS = ["📊 Dashboard", "📄 Historial", "📥 Exportar"]
+TIMEOUT_RERUN = 120
+
+
+# ═══════════════════════════════════════════════════════════════
+# SESIÓN SIMULADA
+# ═══════════════════════════════════════════════════════════════
+def _selectbox(at, etiqueta: str):
+    for sb in at.selectbox:
+        if sb.label == etiqueta:
+            return sb
+    return None
+
+
+def _elegir(at, etiqueta: str, rng: random.Random) -> bool:
+    """Cambia un selectbox a otra opción al azar; False si no está en la página."""
+    sb = _selectbox(at, etiqueta)
+    if sb is None or len(sb.options) < 2:
+        return False
+    sb.set_value(rng.choice([o for o in sb.options if o != sb.value]))
+    return True
+
+
+def _sesion(pasos: int, semilla: int) -> dict:
+    """Ejecuta una sesión y retorna sus latencias de rerun (segundos) y errores."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(semilla)
+    latencias, errores = [], 0
+
+    at = AppTest.from_file(RUTA_APP, default_timeout=TIMEOUT_RERUN)
+    at.secrets["gcp_service_account"] = {}
+    at.session_state["logueado"] = True
+    at.session_state["usuario"] = "admin"
+
+    def rerun():
+        nonlocal errores
+        t0 = time.perf_counter()
+        try:
+            at.run()
+        except Exception:
+            # Un rerun que revienta (timeout, widget inconsistente) cuenta como error
+            errores += 1
+            return
+        latencias.append(time.perf_counter() - t0)
+        errores += len(at.exception)
+
+    rerun()
+    for _ in range(pasos):
+        pagina = rng.choice(PAGINAS)
+        try:
+            radio = at.sidebar.radio[0] if len(at.sidebar.radio) else None
+        except KeyError:
+            # Sin ningún rerun exitoso no hay página que navegar: se reintenta el rerun
+            rerun()
+            continue
+        if radio is not None and radio.value != pagina:
+            radio.set_value(pagina)
+            rerun()
+        if pagina == "📊 Dashboard":
+            acciones = ["📅 Período", "📍 Locación"]
+        elif pagina == "📄 Historial":
+            acciones = ["📍 Locación", "👷 Operador"]
+        else:
+            acciones = []
+        for etiqueta in acciones:
+            if _elegir(at, etiqueta, rng):
+                rerun()
+    return {"latencias": latencias, "errores": errores}
+
+
+# ═══════════════════════════════════════════════════════════════
+# ESCENARIO (un proceso por combinación N × filas)
+# ═══════════════════════════════════════════════════════════════
+def _escenario(sesiones: int, filas: int, pasos: int, latencia: float) -> dict:
+    from streamlit import logger
+
+    logger.set_log_level("error")
+
+    # Caché compartida y log local propios del escenario (antes de importar la app)
+    tmp = tempfile.mkdtemp(prefix="ptap-carga-")
+    os.environ["PTAP_CACHE_DB"] = os.path.join(tmp, "cache.sqlite")
+    os.environ["PTAP_WAL"] = os.path.join(tmp, "muestras.wal")
+    os.environ["PTAP_SNAPSHOT"] = os.path.join(tmp, "snapshot")
+    from ptap_simulacion import HojaSimulada, generar_filas
+
+    ws = HojaSimulada(generar_filas(filas, dias=120), latencia=latencia)
+    cliente = mock.Mock()
+    cliente.open_by_url.return_value.sheet1 = ws
+
+    t0 = time.perf_counter()
+    with mock.patch("gspread.authorize", return_value=cliente), \
+            mock.patch("google.oauth2.service_account.Credentials.from_service_account_info"):
+        with ThreadPoolExecutor(max_workers=sesiones) as pool:
+            resultados = list(pool.map(_sesion, [pasos] * sesiones, range(sesiones)))
+    total = time.perf_counter() - t0
+
+    latencias = np.array([x for r in resultados for x in r["latencias"]]) * 1000
+    # Si todos los reruns fallaron igual se reporta el escenario, con los errores
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) if len(latencias) else (np.nan,) * 3
+    return {
+        "sesiones": sesiones,
+        "filas": filas,
+        "reruns": len(latencias),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "reruns_s": len(latencias) / total,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "llamadas": sum(ws.llamadas.values()),
+        "errores": sum(r["errores"] for r in resultados),
+    }
+
+
+def _lista_enteros(texto: str) -> list:
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de sesiones concurrentes del dashboard PTAP.")
+    parser.add_argument("--sesiones", type=_lista_enteros, default=[1, 5, 10])
+    parser.add_argument("--filas", type=_lista_enteros, default=[1000, 10000])
+    parser.add_argument("--pasos", type=int, default=8, help="Navegaciones por sesión")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia simulada por llamada al Sheet (s)")
+    args = parser.parse_args(argv)
+
+    encabezado = (f"{'sesiones':>8} {'filas':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} "
+                  f"{'p99 ms':>8} {'rerun/s':>8} {'RSS MB':>7} {'llamadas':>9} {'errores':>7}")
+    print(encabezado)
+    print("─" * len(encabezado))
+    contexto = multiprocessing.get_context("spawn")
+    for filas in args.filas:
+        for sesiones in args.sesiones:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                r = pool.submit(_escenario, sesiones, filas, args.pasos, args.latencia).result()
+            print(f"{r['sesiones']:>8} {r['filas']:>8} {r['reruns']:>7} {r['p50_ms']:>8.0f} "
+                  f"{r['p95_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['reruns_s']:>8.1f} "
+                  f"{r['rss_mb']:>7.0f} {r['llamadas']:>9} {r['errores']:>7}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
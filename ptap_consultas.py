@@ -0,0 +1,101 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Motor de consultas del Historial                        ║
+║  Índices por locación / operador / fecha + paginación keyset    ║
+╚══════════════════════════════════════════════════════════════════╝
+
+El índice se construye una vez por versión de datos: ordena el snapshot por
+fecha descendente y guarda, para cada locación y operador, las posiciones
+(ordenadas) de sus filas. Una consulta intersecta esas listas y recorta el
+rango de fechas por búsqueda binaria, sin recorrer el DataFrame. Solo la
+página visible se materializa.
+
+La clave de paginación (keyset) es la posición de la fila en ese orden total:
+"siguiente" continúa después de la última fila mostrada y "anterior" termina
+antes de la primera, sin depender de un offset.
+"""
+import numpy as np
+import pandas as pd
+
+TAMANO_PAGINA = 50
+
+
+class IndiceHistorial:
+    """Snapshot ordenado (más reciente primero) con índices por columna."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.sort_values(["Fecha_dt", "Fecha_Hora"], ascending=False,
+                                 na_position="last", kind="stable").reset_index(drop=True)
+        # NaT se representa como el int64 mínimo: queda al final del orden descendente
+        self._fechas = self.df["Fecha_dt"].values.astype("datetime64[ns]").astype(np.int64)
+        self._fechas_asc = self._fechas[::-1]
+        self.por_locacion = {k: np.asarray(v) for k, v in self.df.groupby("Locación", sort=True).indices.items()}
+        self.por_operador = {k: np.asarray(v) for k, v in self.df.groupby("Operador", sort=True).indices.items()}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def locaciones(self) -> list:
+        return list(self.por_locacion)
+
+    @property
+    def operadores(self) -> list:
+        return list(self.por_operador)
+
+    def _rango_fechas(self, desde=None, hasta=None) -> tuple:
+        """Posiciones [inicio, fin) con ``desde <= Fecha_dt <= hasta`` (búsqueda binaria)."""
+        n = len(self._fechas)
+        inicio, fin = 0, n
+        if hasta is not None:
+            inicio = n - int(np.searchsorted(self._fechas_asc, pd.Timestamp(hasta).value, side="right"))
+        if desde is not None:
+            fin = n - int(np.searchsorted(self._fechas_asc, pd.Timestamp(desde).value, side="left"))
+        return inicio, max(inicio, fin)
+
+    def filtrar(self, locacion: str = None, operador: str = None, desde=None, hasta=None) -> np.ndarray:
+        """Posiciones (ordenadas) de las filas que cumplen todos los filtros."""
+        inicio, fin = self._rango_fechas(desde, hasta)
+        listas = []
+        if locacion is not None:
+            listas.append(self.por_locacion.get(locacion, np.empty(0, dtype=np.intp)))
+        if operador is not None:
+            listas.append(self.por_operador.get(operador, np.empty(0, dtype=np.intp)))
+        if not listas:
+            return np.arange(inicio, fin)
+
+        recortadas = [p[np.searchsorted(p, inicio):np.searchsorted(p, fin)] for p in listas]
+        resultado = recortadas[0]
+        for p in recortadas[1:]:
+            resultado = np.intersect1d(resultado, p, assume_unique=True)
+        return resultado
+
+    def rango_disponible(self, posiciones: np.ndarray) -> tuple:
+        """(fecha mínima, fecha máxima) válidas entre las posiciones dadas, o (None, None)."""
+        fechas = self._fechas[posiciones]
+        fechas = fechas[fechas != np.iinfo(np.int64).min]
+        if fechas.size == 0:
+            return None, None
+        return pd.Timestamp(fechas[-1]), pd.Timestamp(fechas[0])
+
+    @staticmethod
+    def pagina(posiciones: np.ndarray, cursor: int = None, direccion: str = "siguiente",
+               tamano: int = TAMANO_PAGINA) -> tuple:
+        """
+        Página keyset: ``(posiciones_de_la_pagina, indice_de_inicio)``. ``cursor`` es la
+        posición de la última fila mostrada (siguiente) o de la primera (anterior).
+        """
+        total = len(posiciones)
+        if cursor is None:
+            inicio = 0
+        elif direccion == "anterior":
+            inicio = max(0, int(np.searchsorted(posiciones, cursor, side="left")) - tamano)
+        else:
+            inicio = int(np.searchsorted(posiciones, cursor, side="right"))
+        if total and inicio >= total:
+            inicio = (total - 1) // tamano * tamano
+        return posiciones[inicio:inicio + tamano], inicio
+
+    def materializar(self, posiciones: np.ndarray, columnas: list) -> pd.DataFrame:
+        """Solo las filas y columnas visibles."""
+        return self.df.iloc[posiciones][[c for c in columnas if c in self.df.columns]]
@@ -11,12 +11,30 @@ import numpy as np
 import gspread
 import plotly.graph_objects as go
 import plotly.express as px
+import pyarrow as pa
 from plotly.subplots import make_subplots
 from google.oauth2.service_account import Credentials
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import copy
+import hashlib
+import html
+import re
+import threading
+import time
 import pytz
 from io import BytesIO
 
+import ptap_archivo as archivo
+from ptap_analisis import DIMENSIONES, PERIODOS, MotorAnalisis
+from ptap_cache import CacheCompartida
+from ptap_cambios import Huellas
+from ptap_consultas import IndiceHistorial, TAMANO_PAGINA
+from ptap_pronostico import PronosticoCloro
+from ptap_snapshot import cargar_snapshot, guardar_snapshot
+from ptap_wal import RegistroWAL, WAL_PATH
+
 # ═══════════════════════════════════════════════════════════════
 # CONFIGURACIÓN GLOBAL
 # ═══════════════════════════════════════════════════════════════
@@ -35,6 +53,11 @@ LIMITES = {
     "Cloro Residual (mg/L)":  {"optimo": (0.5, 1.5), "alerta": (0.2, 2.0), "unidad": "mg/L"},
 }
 
+# Alertas por página en el feed del dashboard
+TAMANO_PAGINA_ALERTAS = 25
+# Pronóstico de cloro: más allá de este horizonte la extrapolación no se muestra
+HORIZONTE_PRONOSTICO_H = 14 * 24
+
 # --- Usuarios y roles ---
 USUARIOS = {
     "admin":    {"password": "1234",          "nombre": "Administrador",         "rol": "admin"},
@@ -56,6 +79,17 @@ SOLO_CLORO = {loc.strip().lower() for loc in [
     "Dispensador - HSE 02", "Dispensador - Producción"
 ]}
 
+# --- Registro de plantas: cada PTAP con su Google Sheet, locaciones y set solo-cloro ---
+PLANTA_DEFECTO = "ptap-principal"
+PLANTAS = {
+    PLANTA_DEFECTO: {
+        "nombre": "PTAP Principal",
+        "sheet_url": SHEET_URL,
+        "locaciones": LOCACIONES,
+        "solo_cloro": SOLO_CLORO,
+    },
+}
+
 # ═══════════════════════════════════════════════════════════════
 # ESTILOS CSS PROFESIONALES
 # ═══════════════════════════════════════════════════════════════
@@ -158,6 +192,31 @@ CUSTOM_CSS = """
         margin-top: 0.2rem;
     }
 
+    /* --- Feed de alertas (una sola tabla por página) --- */
+    .alert-feed {
+        width: 100%;
+        border-collapse: collapse;
+        font-size: 0.82rem;
+    }
+    .alert-feed td {
+        padding: 0.35rem 0.6rem;
+        border-bottom: 1px solid #fde2e2;
+        color: #78350f;
+    }
+    .alert-feed tr.alert-row-crit td:first-child { border-left: 3px solid #dc2626; }
+    .alert-feed tr.alert-row-warn td:first-child { border-left: 3px solid #d97706; }
+    .alert-feed tr.alert-group td {
+        background: #fef2f2;
+        color: #dc2626;
+        font-weight: 700;
+        border-bottom: 1px solid #fecaca;
+    }
+    .alert-feed .alert-count {
+        font-weight: 400;
+        color: #78350f;
+        margin-left: 0.4rem;
+    }
+
     /* --- Sección / separador visual --- */
     .section-divider {
         border: none;
@@ -224,58 +283,354 @@ CUSTOM_CSS = """
 # FUNCIONES DE DATOS
 # ═══════════════════════════════════════════════════════════════
 @st.cache_resource(show_spinner=False)
-def get_worksheet():
+def get_worksheet(sheet_url: str = SHEET_URL):
     """Conexión autenticada a Google Sheets."""
     creds = Credentials.from_service_account_info(
         st.secrets["gcp_service_account"], scopes=SCOPE
     )
     gc = gspread.authorize(creds)
-    sh = gc.open_by_url(SHEET_URL)
+    sh = gc.open_by_url(sheet_url)
     return sh.sheet1
 
 
-def leer_datos() -> pd.DataFrame:
-    """Lee y procesa todos los registros del Google Sheet."""
-    try:
-        ws = get_worksheet()
-        data = ws.get_all_records()
-        df = pd.DataFrame(data)
-        if df.empty:
-            return df
-
-        # Limpieza de tipos numéricos
-        num_cols = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
-        for col in num_cols:
-            if col in df.columns:
-                df[col] = (
-                    df[col].astype(str)
-                    .str.replace(",", ".", regex=False)
-                    .replace(["", "None", "nan"], np.nan)
-                )
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        # Datetime combinado
-        if "Fecha" in df.columns and "Hora de Toma" in df.columns:
-            df["Fecha_dt"] = pd.to_datetime(df["Fecha"], errors="coerce")
-            df["Fecha_Hora"] = pd.to_datetime(
-                df["Fecha"].astype(str) + " " + df["Hora de Toma"].astype(str),
-                errors="coerce"
-            )
+def procesar_registros(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza tipos numéricos y agrega columnas de fecha a registros crudos."""
+    if df.empty:
         return df
+
+    # Limpieza de tipos numéricos
+    num_cols = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
+    for col in num_cols:
+        if col in df.columns:
+            df[col] = (
+                df[col].astype(str)
+                .str.replace(",", ".", regex=False)
+                .replace(["", "None", "nan"], np.nan)
+            )
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    # Datetime combinado
+    if "Fecha" in df.columns and "Hora de Toma" in df.columns:
+        df["Fecha_dt"] = pd.to_datetime(df["Fecha"], errors="coerce")
+        df["Fecha_Hora"] = pd.to_datetime(
+            df["Fecha"].astype(str) + " " + df["Hora de Toma"].astype(str),
+            errors="coerce"
+        )
+    return df
+
+
+@st.cache_resource(show_spinner=False)
+def get_cache() -> CacheCompartida:
+    """Caché compartida (SQLite en el host) entre todas las réplicas del servidor."""
+    return CacheCompartida()
+
+
+def _leer_hoja(planta: str = PLANTA_DEFECTO) -> pd.DataFrame:
+    """Descarga y procesa todos los registros del Google Sheet de la planta."""
+    ws = get_worksheet(PLANTAS[planta]["sheet_url"])
+    data = ws.get_all_records()
+    df = procesar_registros(pd.DataFrame(data))
+    persistir_snapshot(planta, df, len(data))
+    return df
+
+
+def persistir_snapshot(planta: str, df: pd.DataFrame, filas_hoja: int):
+    """Guarda el snapshot Arrow para el próximo arranque; un fallo de disco no afecta la lectura."""
+    huellas = registrar_huellas(planta, df)
+    if df.empty:
+        return
+    try:
+        guardar_snapshot(planta, df, huellas.version, filas_hoja,
+                         agregados={"resumen_locacion": resumen_locaciones(df, planta)})
+    except (OSError, pa.ArrowException) as e:
+        registrar_error_snapshot(planta, "guardar", e)
+    else:
+        registrar_error_snapshot(planta, "guardar")
+
+
+def registrar_error_snapshot(planta: str, origen: str, error: Exception = None):
+    """
+    Último fallo del snapshot de la planta (``origen``: guardar / sync), visible
+    en la barra lateral de todas las réplicas. Sin ``error`` limpia el fallo
+    previo del mismo origen.
+    """
+    cache = get_cache()
+    if error is None:
+        cache.limpiar_error(f"snapshot:{planta}", origen)
+    else:
+        cache.registrar_error(f"snapshot:{planta}", origen, f"{type(error).__name__}: {error}")
+
+
+def ultimo_error_snapshot(planta: str):
+    return get_cache().ultimo_error(f"snapshot:{planta}")
+
+
+def registrar_huellas(planta: str, df: pd.DataFrame) -> Huellas:
+    """
+    Huellas de una lectura nueva, comparadas con las de la lectura anterior:
+    solo cambia la versión de las locaciones con filas editadas, insertadas o
+    borradas, y con ella sus agregados, alertas y gráficos cacheados.
+    """
+    cache = get_cache()
+    clave = f"huellas:{planta}"
+    huellas = Huellas(df)
+    df.attrs["version"] = huellas.version
+    anterior = cache.leer_snapshot(clave)
+    if anterior is not None:
+        if anterior[1] == huellas.version:
+            return anterior[0]
+        huellas.actualizar(anterior[0])
+    cache.publicar_snapshot(clave, huellas, huellas.version)
+    return huellas
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _huellas_locales(version: str, _df: pd.DataFrame) -> Huellas:
+    return Huellas(_df)
+
+
+def huellas_de(planta: str, df: pd.DataFrame) -> Huellas:
+    """Huellas publicadas de la planta si corresponden a ``df``; si no (p. ej. con archivo), se calculan."""
+    version = df.attrs.get("version")
+    snap = get_cache().leer_snapshot(f"huellas:{planta}")
+    if snap is not None and version is not None and snap[1] == version:
+        return snap[0]
+    return _huellas_locales(version or version_datos(df), df)
+
+
+def _version_snapshot(df: pd.DataFrame) -> str:
+    return df.attrs.get("version") or version_datos(df)
+
+
+def _filas_nuevas(ws, desde: int) -> pd.DataFrame:
+    """Filas del Sheet posteriores a las primeras ``desde`` filas de datos."""
+    encabezados = ws.row_values(1)
+    ultima_col = re.sub(r"\d+", "", gspread.utils.rowcol_to_a1(1, len(encabezados)))
+    filas = ws.get_values(f"A{desde + 2}:{ultima_col}")
+    filas = [f + [""] * (len(encabezados) - len(f)) for f in filas if any(str(c).strip() for c in f)]
+    return pd.DataFrame(filas, columns=encabezados)
+
+
+def sincronizar_delta(planta: str, base: pd.DataFrame, filas_hoja: int):
+    """
+    Pone al día un snapshot cargado de disco trayendo solo las filas agregadas
+    después de ``filas_hoja``. Si el Sheet tiene menos filas (purga del archivo
+    histórico) hace una lectura completa. Corre en segundo plano.
+    """
+    cache = get_cache()
+    clave = f"muestras:{planta}"
+    lease = f"refresco:{clave}"
+    if not cache.adquirir(lease):
+        return
+    try:
+        ws = get_worksheet(PLANTAS[planta]["sheet_url"])
+        total = max(0, len(ws.col_values(1)) - 1)
+        if total < filas_hoja:
+            df = _leer_hoja(planta)
+        else:
+            nuevas = _filas_nuevas(ws, filas_hoja) if total > filas_hoja else pd.DataFrame()
+            if nuevas.empty:
+                # Sin cambios: el snapshot mapeado de cada réplica sigue vigente otro TTL,
+                # salvo que una escritura haya vencido la marca mientras tanto
+                marca = cache.leer_snapshot(f"arranque:{planta}")
+                if marca is not None and marca[2] > 0:
+                    cache.publicar_snapshot(f"arranque:{planta}", {"filas_hoja": filas_hoja},
+                                            _version_snapshot(base))
+                df = None
+            else:
+                df = pd.concat([base, procesar_registros(nuevas)], ignore_index=True)
+                persistir_snapshot(planta, df, filas_hoja + len(nuevas))
+        if df is not None:
+            cache.publicar_snapshot(clave, df, _version_snapshot(df))
+    except (OSError, gspread.exceptions.GSpreadException) as e:
+        # El snapshot de disco sigue sirviendo; el vencimiento normal reintenta
+        registrar_error_snapshot(planta, "sync", e)
+    else:
+        registrar_error_snapshot(planta, "sync")
+    finally:
+        cache.liberar(lease)
+
+
+@st.cache_resource(show_spinner=False)
+def arranque_en_caliente(planta: str):
+    """
+    Una vez por proceso: si la caché compartida no tiene un snapshot vigente,
+    mapea en memoria el snapshot Arrow de disco y lo retorna para servir de
+    inmediato. Solo se publica su versión (``arranque:<planta>``), no la tabla:
+    cada réplica usa su propio mapeo. Lanza el sync delta en segundo plano.
+    """
+    cache = get_cache()
+    snap = cache.leer_snapshot(f"muestras:{planta}")
+    if snap is not None and time.time() - snap[2] < cache.ttl:
+        return None
+    cargado = cargar_snapshot(planta)
+    if cargado is None:
+        return None
+    df, agregados, meta = cargado
+    huellas = registrar_huellas(planta, df)
+    cache.publicar_snapshot(f"arranque:{planta}", {"filas_hoja": meta["filas_hoja"]}, huellas.version)
+    # El resumen guardado se reparte por locación, con la versión de cada una
+    resumen = agregados.get("resumen_locacion")
+    if resumen is not None:
+        for loc, filas in resumen.groupby("Locación", sort=False):
+            if loc in huellas.locaciones:
+                cache.derivado(f"resumen_locacion:{planta}:{loc}", huellas.locaciones[loc],
+                               lambda t=filas.dropna(axis=1, how="all"): t)
+    threading.Thread(target=sincronizar_delta, args=(planta, df, meta["filas_hoja"]),
+                     name=f"sync-delta-{planta}", daemon=True).start()
+    return df
+
+
+def invalidar_muestras(planta: str):
+    """Tras escribir en el Sheet: vence el snapshot compartido y la marca del arranque en caliente."""
+    cache = get_cache()
+    cache.invalidar(f"muestras:{planta}")
+    cache.invalidar(f"arranque:{planta}")
+
+
+def _snapshot_planta(planta: str) -> pd.DataFrame:
+    """
+    Snapshot de la planta vía la caché compartida (propaga errores del backend).
+    El mapeo local del arranque sirve mientras su versión siga marcada como
+    vigente y no se haya publicado una lectura más reciente.
+    """
+    cache = get_cache()
+    local = arranque_en_caliente(planta)
+    if local is not None:
+        marca = cache.leer_snapshot(f"arranque:{planta}")
+        snap = cache.leer_snapshot(f"muestras:{planta}")
+        if (marca is not None and marca[1] == local.attrs.get("version")
+                and time.time() - marca[2] < cache.ttl and (snap is None or snap[2] < marca[2])):
+            return local
+    df, version = cache.obtener_snapshot(
+        f"muestras:{planta}", lambda: _leer_hoja(planta), _version_snapshot)
+    df.attrs["version"] = version
+    return df
+
+
+def leer_datos(planta: str = PLANTA_DEFECTO) -> pd.DataFrame:
+    """
+    Registros procesados desde la caché compartida; solo una réplica a la vez
+    relee el Google Sheet cuando el snapshot vence.
+    """
+    try:
+        return _snapshot_planta(planta)
     except Exception as e:
         st.error(f"⚠️ Error al conectar con Google Sheets: {e}")
         return pd.DataFrame()
 
 
-def guardar_muestra(muestra: list):
-    """Agrega una fila al Google Sheet."""
+def leer_plantas(plantas: list = None) -> tuple:
+    """
+    Carga todas las plantas en paralelo (un hilo por planta). Una planta que
+    falla no afecta a las demás: retorna ``(datos, errores)`` por clave de planta.
+    """
+    plantas = list(plantas or PLANTAS)
+    ctx = get_script_run_ctx()
+
+    def tarea(planta):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return _snapshot_planta(planta)
+
+    datos, errores = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, len(plantas))) as pool:
+        futuros = {planta: pool.submit(tarea, planta) for planta in plantas}
+        for planta, futuro in futuros.items():
+            try:
+                datos[planta] = futuro.result()
+            except Exception as e:
+                errores[planta] = str(e)
+    return datos, errores
+
+
+def agregado_compartido(df: pd.DataFrame, nombre: str, calcular, ttl: float = None):
+    """Agregado derivado publicado en la caché compartida por versión de datos."""
+    version = df.attrs.get("version") or version_datos(df)
+    return get_cache().derivado(nombre, version, calcular, ttl)
+
+
+def directorio_archivo(planta: str = PLANTA_DEFECTO):
+    """Archivo histórico de la planta (la planta por defecto usa el directorio base)."""
+    return archivo.DIR_ARCHIVO if planta == PLANTA_DEFECTO else archivo.DIR_ARCHIVO / planta
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _leer_archivo(desde, hasta, directorio: str, version: str) -> pd.DataFrame:
+    """Particiones archivadas de la ventana; ``version`` invalida al recompactar."""
+    return archivo.leer_archivo(desde, hasta, directorio)
+
+
+def con_archivo(df: pd.DataFrame, desde=None, hasta=None, planta: str = PLANTA_DEFECTO) -> pd.DataFrame:
+    """
+    Completa el tier caliente (Google Sheet) con las particiones archivadas que
+    se solapan con [desde, hasta]. Si la ventana empieza dentro del tier
+    caliente no se abre ningún archivo.
+    """
+    directorio = directorio_archivo(planta)
+    manifiesto = archivo.leer_manifiesto(directorio)
+    if not manifiesto:
+        return df
+    if desde is not None and not df.empty and pd.Timestamp(desde) >= df["Fecha_Hora"].min():
+        return df
+    historico = _leer_archivo(desde, hasta, str(directorio), archivo.version_manifiesto(manifiesto))
+    if historico.empty:
+        return df
+    combinado = pd.concat([historico, df], ignore_index=True)
+    clave = [c for c in archivo.COLS_CLAVE if c in combinado.columns]
+    combinado = combinado.drop_duplicates(subset=clave, keep="last").reset_index(drop=True)
+    # La versión cubre ambos tiers y la porción del archivo incluida: el archivo es
+    # inmutable por versión de manifiesto, así que (filas, primera, última) fija el tramo
+    fechas = historico["Fecha_Hora"]
+    tramo = f"{len(historico)}:{fechas.min():%Y%m%d%H%M%S}:{fechas.max():%Y%m%d%H%M%S}"
+    combinado.attrs["version"] = f"{df.attrs.get('version')}:{archivo.version_manifiesto(manifiesto)}:{tramo}"
+    return combinado
+
+
+def version_datos(df: pd.DataFrame) -> str:
+    """Huella corta del contenido: cambia si se agrega o edita cualquier fila."""
+    if df.empty:
+        return "vacio"
+    hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:12]
+
+
+@st.cache_resource(show_spinner=False)
+def get_wal(planta: str = PLANTA_DEFECTO) -> RegistroWAL:
+    """Log local de muestras; la pasada de recuperación corre una vez por proceso."""
+    if planta == PLANTA_DEFECTO:
+        return RegistroWAL()
+    return RegistroWAL(WAL_PATH.with_name(f"{WAL_PATH.stem}-{planta}{WAL_PATH.suffix}"))
+
+
+def sincronizar_pendientes(planta: str = PLANTA_DEFECTO) -> int:
+    """Reintenta enviar al Google Sheet las muestras que quedaron en el log local."""
+    wal = get_wal(planta)
+    if not wal.pendientes:
+        return 0
     try:
-        ws = get_worksheet()
-        ws.append_row(muestra)
-        return True
-    except Exception as e:
+        enviadas = wal.sincronizar(get_worksheet(PLANTAS[planta]["sheet_url"]))
+    except Exception:
+        return 0
+    invalidar_muestras(planta)
+    return enviadas
+
+
+def guardar_muestra(muestra: list, planta: str = PLANTA_DEFECTO):
+    """Registra la muestra en el log local y la replica al Google Sheet."""
+    wal = get_wal(planta)
+    try:
+        wal.agregar(muestra)
+    except OSError as e:
         st.error(f"⚠️ Error guardando: {e}")
         return False
+    try:
+        wal.sincronizar(get_worksheet(PLANTAS[planta]["sheet_url"]))
+        invalidar_muestras(planta)
+    except Exception as e:
+        st.warning(f"📴 Sin conexión con Google Sheets ({e}). La muestra quedó guardada "
+                   "localmente y se enviará automáticamente.")
+    return True
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -298,6 +653,20 @@ def clasificar_valor(valor: float, param: str) -> str:
         return "crit"
 
 
+def clasificar_serie(valores: pd.Series, param: str) -> np.ndarray:
+    """Versión vectorizada de ``clasificar_valor`` para una columna completa."""
+    v = pd.to_numeric(valores, errors="coerce").to_numpy(dtype=float)
+    lim = LIMITES.get(param)
+    if lim is None:
+        return np.full(len(v), "ok", dtype=object)
+    lo_opt, hi_opt = lim["optimo"]
+    lo_alr, hi_alr = lim["alerta"]
+    return np.select(
+        [np.isnan(v) | ((v >= lo_opt) & (v <= hi_opt)), (v >= lo_alr) & (v <= hi_alr)],
+        ["ok", "warn"], "crit",
+    ).astype(object)
+
+
 def calcular_cumplimiento(df: pd.DataFrame, param: str) -> float:
     """Porcentaje de valores dentro del rango óptimo."""
     series = df[param].dropna()
@@ -309,44 +678,55 @@ def calcular_cumplimiento(df: pd.DataFrame, param: str) -> float:
     return round(en_rango / len(series) * 100, 1)
 
 
-def generar_alertas(df: pd.DataFrame) -> list:
-    """Genera lista de alertas para las últimas 48 horas."""
+def generar_alertas(df: pd.DataFrame, horas: int = 48, solo_cloro: set = None) -> list:
+    """Genera lista de alertas para las últimas ``horas`` (None = todo el DataFrame)."""
+    solo_cloro = SOLO_CLORO if solo_cloro is None else solo_cloro
     alertas = []
     ahora = datetime.now()
-    recientes = df[df["Fecha_Hora"] >= ahora - timedelta(hours=48)].copy()
+    if horas is None:
+        recientes = df
+    else:
+        recientes = df[df["Fecha_Hora"] >= ahora - timedelta(hours=horas)].copy()
     if recientes.empty:
         return alertas
 
-    for _, row in recientes.iterrows():
-        loc = row.get("Locación", "")
-        fecha_hora = row.get("Fecha_Hora", "")
-        loc_norm = str(loc).strip().lower()
-
-        params_a_revisar = ["Cloro Residual (mg/L)"]
-        if loc_norm not in SOLO_CLORO:
-            params_a_revisar = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
-
-        for param in params_a_revisar:
-            val = row.get(param)
-            estado = clasificar_valor(val, param)
-            if estado in ("warn", "crit"):
-                emoji = "🟡" if estado == "warn" else "🔴"
-                lim = LIMITES[param]
-                lo, hi = lim["optimo"]
-                alertas.append({
-                    "emoji": emoji,
-                    "estado": estado,
-                    "locacion": loc,
-                    "parametro": param,
-                    "valor": val,
-                    "rango_optimo": f"{lo} – {hi}",
-                    "fecha_hora": fecha_hora,
-                })
-    return alertas
+    # Clasificación vectorizada; el orden de salida es fila por fila y, dentro de
+    # cada fila, pH → Turbidez → Cloro (igual que recorrer con iterrows)
+    solo_cl = recientes["Locación"].astype(str).str.strip().str.lower().isin(solo_cloro).to_numpy()
+    partes = []
+    for orden, param in enumerate(["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]):
+        if param not in recientes.columns:
+            continue  # Sheet sin esa columna: sin alertas del parámetro, como con row.get
+        estado = clasificar_serie(recientes[param], param)
+        mask = estado != "ok"
+        if param != "Cloro Residual (mg/L)":
+            mask &= ~solo_cl
+        if not mask.any():
+            continue
+        lo, hi = LIMITES[param]["optimo"]
+        partes.append(pd.DataFrame({
+            "_fila": np.flatnonzero(mask), "_orden": orden,
+            "estado": estado[mask],
+            "locacion": recientes["Locación"].to_numpy()[mask],
+            "parametro": param,
+            "valor": recientes[param].to_numpy()[mask],
+            "rango_optimo": f"{lo} – {hi}",
+            "fecha_hora": recientes["Fecha_Hora"].to_numpy()[mask],
+        }))
+    if not partes:
+        return alertas
 
+    tabla = pd.concat(partes, ignore_index=True).sort_values(["_fila", "_orden"], kind="stable")
+    tabla.insert(0, "emoji", np.where(tabla["estado"] == "warn", "🟡", "🔴"))
+    tabla["fecha_hora"] = pd.to_datetime(tabla["fecha_hora"])
+    return tabla.drop(columns=["_fila", "_orden"]).to_dict("records")
 
-def resumen_ejecutivo(df: pd.DataFrame, dias: int = 7) -> dict:
-    """Calcula KPIs globales para el dashboard ejecutivo."""
+
+def resumen_ejecutivo(df: pd.DataFrame, dias: int = 7, solo_cloro: set = None, alertas: list = None) -> dict:
+    """
+    Calcula KPIs globales para el dashboard ejecutivo. ``alertas`` permite pasar
+    alertas ya calculadas (p. ej. cacheadas por locación); se filtran a las 48h.
+    """
     ahora = datetime.now()
     reciente = df[df["Fecha_Hora"] >= ahora - timedelta(days=dias)].copy()
     total_muestras = len(reciente)
@@ -364,7 +744,11 @@ def resumen_ejecutivo(df: pd.DataFrame, dias: int = 7) -> dict:
             cumplimiento[param] = None
 
     # Alertas críticas
-    alertas = generar_alertas(reciente)
+    if alertas is None:
+        alertas = generar_alertas(reciente, solo_cloro=solo_cloro)
+    else:
+        alertas = [a for a in alertas if a["fecha_hora"] >= ahora - timedelta(hours=48)]
+    alertas.sort(key=lambda a: a["fecha_hora"], reverse=True)
     criticas = [a for a in alertas if a["estado"] == "crit"]
 
     return {
@@ -373,10 +757,89 @@ def resumen_ejecutivo(df: pd.DataFrame, dias: int = 7) -> dict:
         "cumplimiento": cumplimiento,
         "alertas_criticas": len(criticas),
         "alertas_total": len(alertas),
-        "alertas_detalle": alertas[:10],  # últimas 10
+        "alertas_detalle": alertas,  # todas, más recientes primero
     }
 
 
+def resumen_por_locacion(df: pd.DataFrame) -> pd.DataFrame:
+    """Estadísticas (promedio, mín, máx, % cumplimiento) por locación y parámetro."""
+    resumen_rows = []
+    for loc in df["Locación"].unique():
+        sub = df[df["Locación"] == loc]
+        row = {"Locación": loc, "Total Muestras": len(sub)}
+        for param in ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]:
+            s = sub[param].dropna()
+            if not s.empty:
+                row[f"{param} - Promedio"] = round(s.mean(), 3)
+                row[f"{param} - Mín"] = round(s.min(), 3)
+                row[f"{param} - Máx"] = round(s.max(), 3)
+                lo, hi = LIMITES[param]["optimo"]
+                row[f"{param} - % Cumpl."] = round(((s >= lo) & (s <= hi)).mean() * 100, 1)
+        resumen_rows.append(row)
+    return pd.DataFrame(resumen_rows)
+
+
+def resumen_locaciones(df: pd.DataFrame, planta: str = PLANTA_DEFECTO) -> pd.DataFrame:
+    """``resumen_por_locacion`` cacheado por locación: una edición solo recalcula su locación."""
+    huellas = huellas_de(planta, df)
+    cache = get_cache()
+    partes = [
+        cache.derivado(f"resumen_locacion:{planta}:{loc}", version,
+                       lambda loc=loc: resumen_por_locacion(df[df["Locación"].astype(str) == loc]))
+        for loc, version in huellas.locaciones.items()
+    ]
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+
+def alertas_por_locacion(df: pd.DataFrame, planta: str = PLANTA_DEFECTO, solo_cloro: set = None) -> list:
+    """Todas las alertas de ``df``, cacheadas por locación y versión de la locación."""
+    huellas = huellas_de(planta, df)
+    cache = get_cache()
+    alertas = []
+    for loc, version in huellas.locaciones.items():
+        alertas += cache.derivado(f"alertas:{planta}:{loc}", version,
+                                  lambda loc=loc: generar_alertas(df[df["Locación"].astype(str) == loc],
+                                                                  horas=None, solo_cloro=solo_cloro))
+    return alertas
+
+
+def modelo_cloro(planta: str, df: pd.DataFrame) -> PronosticoCloro:
+    """
+    Modelo de decaimiento de cloro de los dispensadores, publicado en la caché
+    compartida. Con una lectura nueva solo se incorporan las muestras de las
+    locaciones cuya versión cambió.
+    """
+    cache = get_cache()
+    huellas = huellas_de(planta, df)
+    clave = f"modelo_cloro:{planta}"
+    snap = cache.leer_snapshot(clave)
+    if snap is not None and snap[1] == huellas.version:
+        return snap[0]
+    # Copia: el modelo publicado puede estar en uso por otras sesiones de este proceso
+    modelo = copy.deepcopy(snap[0]) if snap is not None else PronosticoCloro(LIMITES["Cloro Residual (mg/L)"]["alerta"][0])
+    modelo.actualizar(df, huellas.filas, huellas.locaciones, PLANTAS[planta]["solo_cloro"])
+    cache.publicar_snapshot(clave, modelo, huellas.version)
+    return modelo
+
+
+def formato_horas(horas: float) -> str:
+    """Tiempo hasta el umbral en texto corto ("Ahora", "18 h", "3.5 d", "> 14 d", "Estable")."""
+    if pd.isna(horas):
+        return "—"
+    if horas <= 0:
+        return "Ahora"
+    if horas > HORIZONTE_PRONOSTICO_H:
+        return "Estable" if np.isinf(horas) else f"> {HORIZONTE_PRONOSTICO_H // 24} d"
+    return f"{horas:.0f} h" if horas < 48 else f"{horas / 24:.1f} d"
+
+
+def estado_horas(horas: float) -> str:
+    """Estado del KPI de pronóstico: crítico a 24 h o menos del umbral, alerta hasta 72 h, óptimo después o sin estimación."""
+    if pd.isna(horas) or horas > 72:
+        return "ok"
+    return "warn" if horas > 24 else "crit"
+
+
 # ═══════════════════════════════════════════════════════════════
 # COMPONENTES UI
 # ═══════════════════════════════════════════════════════════════
@@ -409,6 +872,65 @@ def render_kpi_card(label: str, value: str, delta: str = "", estado: str = "ok",
     """, unsafe_allow_html=True)
 
 
+def render_feed_alertas(alertas: list, clave: str = "alertas"):
+    """
+    Feed de alertas paginado en el servidor y renderizado como una sola tabla
+    HTML, opcionalmente agrupado por locación o parámetro con sus conteos.
+    """
+    campos = {"Sin agrupar": None, "Por locación": "locacion", "Por parámetro": "parametro"}
+    col_g, col_info, col_prev, col_next = st.columns([2, 3, 1, 1])
+    with col_g:
+        agrupar = st.selectbox("Agrupar", list(campos), key=f"{clave}_agrupar", label_visibility="collapsed")
+    campo = campos[agrupar]
+
+    # Conteos por grupo sobre todas las alertas (no solo la página visible)
+    conteos = {}
+    if campo:
+        for a in alertas:
+            c = conteos.setdefault(a[campo], {"crit": 0, "warn": 0})
+            c[a["estado"]] += 1
+        orden = {g: i for i, g in enumerate(sorted(conteos, key=lambda g: (-conteos[g]["crit"], -sum(conteos[g].values()), g)))}
+        alertas = sorted(alertas, key=lambda a: orden[a[campo]])  # estable: conserva el orden por fecha
+
+    # Página actual; vuelve a la primera si cambia la agrupación o el conjunto de alertas
+    total = len(alertas)
+    n_paginas = max(1, -(-total // TAMANO_PAGINA_ALERTAS))
+    filtro = (agrupar, total)
+    estado = st.session_state.get(f"{clave}_pagina")
+    pagina = estado[1] if estado and estado[0] == filtro else 0
+    pagina = min(pagina, n_paginas - 1)
+
+    def mover(destino: int):
+        st.session_state[f"{clave}_pagina"] = (filtro, destino)
+
+    with col_info:
+        st.markdown(f"**{total} alertas** · Página {pagina + 1} de {n_paginas}")
+    with col_prev:
+        st.button("◀", key=f"{clave}_prev", use_container_width=True, disabled=pagina == 0,
+                  on_click=mover, args=(pagina - 1,))
+    with col_next:
+        st.button("▶", key=f"{clave}_next", use_container_width=True, disabled=pagina >= n_paginas - 1,
+                  on_click=mover, args=(pagina + 1,))
+
+    filas, grupo_actual = [], object()
+    for a in alertas[pagina * TAMANO_PAGINA_ALERTAS:(pagina + 1) * TAMANO_PAGINA_ALERTAS]:
+        if campo and a[campo] != grupo_actual:
+            grupo_actual = a[campo]
+            c = conteos[grupo_actual]
+            filas.append(
+                f'<tr class="alert-group"><td colspan="4">{html.escape(str(grupo_actual))}'
+                f'<span class="alert-count">{c["crit"] + c["warn"]} alertas · 🔴 {c["crit"]} · 🟡 {c["warn"]}</span></td></tr>'
+            )
+        fh = a["fecha_hora"]
+        fh_str = fh.strftime("%d/%m %H:%M") if hasattr(fh, "strftime") else str(fh)
+        filas.append(
+            f'<tr class="alert-row-{a["estado"]}"><td>{a["emoji"]} {html.escape(str(a["parametro"]))}</td>'
+            f'<td>{html.escape(str(a["locacion"]))}</td>'
+            f'<td>Valor: <b>{a["valor"]:.2f}</b> (Rango óptimo: {a["rango_optimo"]})</td><td>{fh_str}</td></tr>'
+        )
+    st.markdown(f'<table class="alert-feed">{"".join(filas)}</table>', unsafe_allow_html=True)
+
+
 def render_badge(estado: str, texto: str = "") -> str:
     """Retorna HTML de un badge de estado."""
     cls = {"ok": "badge-ok", "warn": "badge-warn", "crit": "badge-crit"}.get(estado, "badge-ok")
@@ -442,60 +964,137 @@ RANGE_COLORS = {
 }
 
 
-def crear_grafico_parametro(df: pd.DataFrame, param: str, height: int = 320) -> go.Figure:
-    """Crea un gráfico de línea profesional para un parámetro."""
-    fig = go.Figure()
-    color = PARAM_COLORS.get(param, "#6366f1")
-    lim = LIMITES[param]
+def _eje_fechas(fechas) -> np.ndarray:
+    """
+    Fechas como milisegundos desde epoch (float64). Un eje ``type="date"`` las
+    interpreta igual que un string ISO, pero Plotly las envía como arreglo binario.
+    """
+    return pd.to_datetime(pd.Series(fechas)).to_numpy("datetime64[ms]").astype(np.int64).astype(np.float64)
+
+
+def _valores(serie) -> np.ndarray:
+    """Valores en float32 (NaN = hueco): la mitad de bytes y precisión de sobra para mediciones."""
+    return pd.to_numeric(pd.Series(serie), errors="coerce").to_numpy(np.float32)
+
 
-    # Línea principal
-    fig.add_trace(go.Scatter(
-        x=df["Fecha_Hora"], y=df[param],
+def _traza_parametro(x: np.ndarray, valores, param: str) -> go.Scatter:
+    """Línea con marcadores de un parámetro (``x`` ya en epoch ms)."""
+    color = PARAM_COLORS.get(param, "#6366f1")
+    return go.Scatter(
+        x=x, y=_valores(valores),
         mode="lines+markers",
         name=param,
         line=dict(color=color, width=2.5),
         marker=dict(size=5, color=color, line=dict(width=1, color="#ffffff")),
         hovertemplate=f"<b>{param}</b><br>Valor: %{{y:.2f}}<br>%{{x|%d %b %Y %H:%M}}<extra></extra>"
-    ))
+    )
 
-    # Bandas de rango
+
+def _bandas_parametro(param: str, xref: str = "x", yref: str = "y") -> tuple:
+    """
+    ``(shapes, annotations)`` con las bandas de rango y líneas de límite de
+    ``param`` sobre los ejes ``xref``/``yref``. Se asignan al layout de una vez:
+    ``add_hrect`` revalida todas las shapes en cada llamada.
+    """
+    lim = LIMITES[param]
     lo_opt, hi_opt = lim["optimo"]
     lo_alr, hi_alr = lim["alerta"]
 
-    fig.add_hrect(y0=lo_opt, y1=hi_opt, annotation_text="Rango óptimo",
-                  annotation_position="top left", annotation_font_size=10,
-                  annotation_font_color="rgba(5,150,105,0.7)",
-                  **RANGE_COLORS["ok"])
+    def banda(y0, y1, estado):
+        return dict(type="rect", xref=f"{xref} domain", yref=yref, x0=0, x1=1, y0=y0, y1=y1,
+                    fillcolor=RANGE_COLORS[estado]["fillcolor"], line=dict(width=RANGE_COLORS[estado]["line_width"]))
+
+    def limite(y):
+        return dict(type="line", xref=f"{xref} domain", yref=yref, x0=0, x1=1, y0=y, y1=y,
+                    line=dict(color="rgba(5,150,105,0.3)", width=1, dash="dot"))
 
+    shapes = [banda(lo_opt, hi_opt, "ok")]
     # Alertas amarillas
     if param == "Cloro Residual (mg/L)":
-        fig.add_hrect(y0=lo_alr, y1=lo_opt, **RANGE_COLORS["warn"])
-        fig.add_hrect(y0=hi_opt, y1=hi_alr, **RANGE_COLORS["warn"])
-        fig.add_hrect(y0=0, y1=lo_alr, **RANGE_COLORS["crit"])
-        fig.add_hrect(y0=hi_alr, y1=hi_alr + 1, **RANGE_COLORS["crit"])
+        shapes += [banda(lo_alr, lo_opt, "warn"), banda(hi_opt, hi_alr, "warn"),
+                   banda(0, lo_alr, "crit"), banda(hi_alr, hi_alr + 1, "crit")]
     elif param == "pH":
-        fig.add_hrect(y0=lo_alr, y1=lo_opt, **RANGE_COLORS["warn"])
-        fig.add_hrect(y0=hi_opt, y1=hi_alr, **RANGE_COLORS["warn"])
-        fig.add_hrect(y0=0, y1=lo_alr, **RANGE_COLORS["crit"])
-        fig.add_hrect(y0=hi_alr, y1=14, **RANGE_COLORS["crit"])
+        shapes += [banda(lo_alr, lo_opt, "warn"), banda(hi_opt, hi_alr, "warn"),
+                   banda(0, lo_alr, "crit"), banda(hi_alr, 14, "crit")]
     elif param == "Turbidez (NTU)":
-        fig.add_hrect(y0=5, y1=10, **RANGE_COLORS["warn"])
-        fig.add_hrect(y0=10, y1=15, **RANGE_COLORS["crit"])
+        shapes += [banda(5, 10, "warn"), banda(10, 15, "crit")]
 
     # Líneas de límite
-    fig.add_hline(y=lo_opt, line=dict(color="rgba(5,150,105,0.3)", width=1, dash="dot"))
-    fig.add_hline(y=hi_opt, line=dict(color="rgba(5,150,105,0.3)", width=1, dash="dot"))
+    shapes += [limite(lo_opt), limite(hi_opt)]
+    nota = dict(text="Rango óptimo", xref=f"{xref} domain", yref=yref, x=0, y=hi_opt,
+                xanchor="left", yanchor="top", showarrow=False,
+                font=dict(size=10, color="rgba(5,150,105,0.7)"))
+    return shapes, [nota]
+
+
+def crear_grafico_parametro(df: pd.DataFrame, param: str, height: int = 320) -> go.Figure:
+    """Crea un gráfico de línea profesional para un parámetro."""
+    fig = go.Figure()
+    df = df[df["Fecha_Hora"].notna()]
+    fig.add_trace(_traza_parametro(_eje_fechas(df["Fecha_Hora"]), df[param], param))
+    shapes, notas = _bandas_parametro(param)
 
     fig.update_layout(
         **CHART_TEMPLATE,
         height=height,
         yaxis_title=param,
         xaxis_title="",
+        xaxis_type="date",
         showlegend=False,
+        shapes=shapes,
+        annotations=notas,
     )
     return fig
 
 
+def crear_grafico_locacion(df: pd.DataFrame, params: list, alto_panel: int = 250) -> go.Figure:
+    """
+    Todos los parámetros de una locación en una sola figura: un panel por
+    parámetro con sus bandas, apilados sobre un único eje de fechas (zoom y
+    hover enlazados). Un solo payload y un solo render en lugar de uno por parámetro.
+    """
+    if len(params) == 1:
+        return crear_grafico_parametro(df, params[0])
+    n = len(params)
+    fig = make_subplots(rows=n, cols=1, shared_xaxes=True, vertical_spacing=0.05)
+    df = df[df["Fecha_Hora"].notna()]
+    x = _eje_fechas(df["Fecha_Hora"])
+
+    # Un único eje x (el inferior) para todos los paneles: el zoom es uno solo y
+    # hoversubplots="axis" muestra el hover de los tres parámetros a la vez
+    eje_x = f"x{n}"
+    trazas, shapes, notas = [], [], []
+    for fila, param in enumerate(params, start=1):
+        eje_y = "y" if fila == 1 else f"y{fila}"
+        trazas.append(_traza_parametro(x, df[param], param).update(xaxis=eje_x, yaxis=eje_y))
+        s, a = _bandas_parametro(param, eje_x, eje_y)
+        shapes += s
+        notas += a
+        fig.layout["yaxis" if fila == 1 else f"yaxis{fila}"].update(title_text=param, anchor=eje_x,
+                                                                    **CHART_TEMPLATE["yaxis"])
+    for i in range(1, n):
+        fig.layout["xaxis" if i == 1 else f"xaxis{i}"] = None
+    fig.layout[f"xaxis{n}"].update(type="date", **CHART_TEMPLATE["xaxis"])
+    fig.add_traces(trazas)
+    fig.update_layout(
+        **{k: v for k, v in CHART_TEMPLATE.items() if k not in ("xaxis", "yaxis")},
+        height=alto_panel * n,
+        showlegend=False,
+        hovermode="x unified",
+        hoversubplots="axis",
+        shapes=shapes,
+        annotations=notas,
+    )
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def figura_locacion(planta: str, locacion: str, params: tuple, version_loc: str, ventana: tuple,
+                    _df_loc: pd.DataFrame) -> go.Figure:
+    """Gráfico de una locación; se regenera solo si cambian sus filas o la ventana del período."""
+    return crear_grafico_locacion(_df_loc, list(params))
+
+
 def crear_grafico_tendencia_global(df: pd.DataFrame, param: str) -> go.Figure:
     """Gráfico de tendencia con media móvil por locación."""
     fig = go.Figure()
@@ -503,11 +1102,11 @@ def crear_grafico_tendencia_global(df: pd.DataFrame, param: str) -> go.Figure:
     colores = px.colors.qualitative.Set2
 
     for i, loc in enumerate(sorted(locaciones)):
-        sub = df[df["Locación"] == loc].sort_values("Fecha_Hora")
+        sub = df[(df["Locación"] == loc) & df["Fecha_Hora"].notna()].sort_values("Fecha_Hora")
         if sub[param].dropna().empty:
             continue
         fig.add_trace(go.Scatter(
-            x=sub["Fecha_Hora"], y=sub[param].rolling(5, min_periods=1).mean(),
+            x=_eje_fechas(sub["Fecha_Hora"]), y=_valores(sub[param].rolling(5, min_periods=1).mean()),
             mode="lines", name=loc,
             line=dict(color=colores[i % len(colores)], width=2),
             hovertemplate=f"<b>{loc}</b><br>{param}: %{{y:.2f}}<extra></extra>"
@@ -519,6 +1118,7 @@ def crear_grafico_tendencia_global(df: pd.DataFrame, param: str) -> go.Figure:
         **CHART_TEMPLATE,
         height=350,
         yaxis_title=param,
+        xaxis_type="date",
         legend=dict(orientation="h", yanchor="bottom", y=-0.35, xanchor="center", x=0.5, font_size=11),
     )
     return fig
@@ -555,14 +1155,14 @@ def crear_heatmap_cumplimiento(df: pd.DataFrame, dias: int = 30) -> go.Figure:
     pivot = df_heat.pivot_table(index="Locación", columns="Día", values="Cumplimiento", aggfunc="mean")
 
     fig = go.Figure(data=go.Heatmap(
-        z=pivot.values,
-        x=pivot.columns,
+        z=pivot.to_numpy(np.float32),
+        x=_eje_fechas(pivot.columns),
         y=pivot.index,
         colorscale=[
             [0, "#dc2626"], [0.5, "#fbbf24"], [0.75, "#34d399"], [1, "#059669"]
         ],
         zmin=0, zmax=100,
-        hovertemplate="<b>%{y}</b><br>%{x}<br>Cumplimiento: %{z:.0f}%<extra></extra>",
+        hovertemplate="<b>%{y}</b><br>%{x|%Y-%m-%d}<br>Cumplimiento: %{z:.0f}%<extra></extra>",
         colorbar=dict(title="% Cumpl.", ticksuffix="%", len=0.6),
     ))
     chart_cfg = dict(CHART_TEMPLATE)
@@ -572,7 +1172,7 @@ def crear_heatmap_cumplimiento(df: pd.DataFrame, dias: int = 30) -> go.Figure:
         **chart_cfg,
         height=max(300, len(pivot) * 45 + 100),
         yaxis=dict(gridcolor="rgba(203,213,225,0.4)", showgrid=True, autorange="reversed"),
-        xaxis=dict(gridcolor="rgba(203,213,225,0.4)", showgrid=True, tickangle=-45, tickfont_size=10),
+        xaxis=dict(gridcolor="rgba(203,213,225,0.4)", showgrid=True, tickangle=-45, tickfont_size=10, type="date"),
     )
     return fig
 
@@ -580,7 +1180,7 @@ def crear_heatmap_cumplimiento(df: pd.DataFrame, dias: int = 30) -> go.Figure:
 # ═══════════════════════════════════════════════════════════════
 # GENERACIÓN DE REPORTES
 # ═══════════════════════════════════════════════════════════════
-def generar_reporte_excel(df: pd.DataFrame) -> BytesIO:
+def generar_reporte_excel(df: pd.DataFrame, solo_cloro: set = None, resumen: pd.DataFrame = None) -> BytesIO:
     """Genera reporte Excel con múltiples hojas."""
     output = BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -589,23 +1189,11 @@ def generar_reporte_excel(df: pd.DataFrame) -> BytesIO:
         df_export.to_excel(writer, sheet_name="Registros", index=False)
 
         # Hoja 2: Resumen por locación
-        resumen_rows = []
-        for loc in df["Locación"].unique():
-            sub = df[df["Locación"] == loc]
-            row = {"Locación": loc, "Total Muestras": len(sub)}
-            for param in ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]:
-                s = sub[param].dropna()
-                if not s.empty:
-                    row[f"{param} - Promedio"] = round(s.mean(), 3)
-                    row[f"{param} - Mín"] = round(s.min(), 3)
-                    row[f"{param} - Máx"] = round(s.max(), 3)
-                    lo, hi = LIMITES[param]["optimo"]
-                    row[f"{param} - % Cumpl."] = round(((s >= lo) & (s <= hi)).mean() * 100, 1)
-            resumen_rows.append(row)
-        pd.DataFrame(resumen_rows).to_excel(writer, sheet_name="Resumen", index=False)
+        resumen = resumen_por_locacion(df) if resumen is None else resumen
+        resumen.to_excel(writer, sheet_name="Resumen", index=False)
 
         # Hoja 3: Alertas
-        alertas = generar_alertas(df)
+        alertas = generar_alertas(df, solo_cloro=solo_cloro)
         if alertas:
             pd.DataFrame(alertas).to_excel(writer, sheet_name="Alertas", index=False)
 
@@ -616,8 +1204,9 @@ def generar_reporte_excel(df: pd.DataFrame) -> BytesIO:
 # ═══════════════════════════════════════════════════════════════
 # PÁGINAS / SECCIONES
 # ═══════════════════════════════════════════════════════════════
-def pagina_dashboard(df: pd.DataFrame):
+def pagina_dashboard(df: pd.DataFrame, planta: str = PLANTA_DEFECTO):
     """Dashboard ejecutivo con KPIs y gráficos."""
+    cfg = PLANTAS[planta]
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
 
     # --- Selectores de período y locación en la misma fila ---
@@ -627,6 +1216,8 @@ def pagina_dashboard(df: pd.DataFrame):
     dias_map = {"Últimos 7 días": 7, "Últimos 15 días": 15, "Últimos 30 días": 30, "Todo": 9999}
     dias = dias_map[periodo]
     ahora = datetime.now()
+    df_caliente = df
+    df = con_archivo(df, ahora - timedelta(days=dias) if dias < 9999 else None, planta=planta)
     df_periodo = df[df["Fecha_Hora"] >= ahora - timedelta(days=dias)].copy() if dias < 9999 else df.copy()
 
     locaciones_disp_init = sorted(df_periodo["Locación"].dropna().unique())
@@ -638,14 +1229,19 @@ def pagina_dashboard(df: pd.DataFrame):
             loc_sel_init = None
 
     # --- KPIs ejecutivos ---
-    resumen = resumen_ejecutivo(df, dias)
-    k1, k2, k3, k4 = st.columns(4)
+    resumen = agregado_compartido(df, f"resumen:{planta}:{dias}",
+                                  lambda: resumen_ejecutivo(df, dias, cfg["solo_cloro"],
+                                                            alertas_por_locacion(df_caliente, planta, cfg["solo_cloro"])),
+                                  ttl=60)
+    pronostico = modelo_cloro(planta, df_caliente).pronosticar(ahora)
+    umbral_cloro = LIMITES["Cloro Residual (mg/L)"]["alerta"][0]
+    k1, k2, k3, k4, k5 = st.columns(5)
     with k1:
         render_kpi_card("Muestras Registradas", str(resumen["total_muestras"]),
                         f"Últimos {dias} días" if dias < 9999 else "Total histórico",
                         variante="kpi-blue")
     with k2:
-        render_kpi_card("Locaciones Activas", f"{resumen['locaciones_activas']}/{len(LOCACIONES)}",
+        render_kpi_card("Locaciones Activas", f"{resumen['locaciones_activas']}/{len(cfg['locaciones'])}",
                         "Con registros en el período", variante="kpi-blue")
     with k3:
         cumpl_cloro = resumen["cumplimiento"].get("Cloro Residual (mg/L)")
@@ -658,23 +1254,21 @@ def pagina_dashboard(df: pd.DataFrame):
         render_kpi_card("Alertas Críticas (48h)",
                         str(resumen["alertas_criticas"]),
                         f"{resumen['alertas_total']} alertas totales", est_alertas)
+    with k5:
+        proximos = pronostico.dropna(subset=["Horas al umbral"]).sort_values("Horas al umbral")
+        if proximos.empty:
+            render_kpi_card(f"Cloro bajo {umbral_cloro} mg/L en", "—", "Sin datos suficientes", variante="kpi-blue")
+        else:
+            primero = proximos.iloc[0]
+            render_kpi_card(f"Cloro bajo {umbral_cloro} mg/L en", formato_horas(primero["Horas al umbral"]),
+                            html.escape(primero["Locación"]), estado_horas(primero["Horas al umbral"]))
 
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
 
     # --- Alertas activas ---
     if resumen["alertas_detalle"]:
         with st.expander(f"⚠️ **Alertas recientes** ({resumen['alertas_total']})", expanded=resumen["alertas_criticas"] > 0):
-            for a in resumen["alertas_detalle"]:
-                fh = a["fecha_hora"]
-                fh_str = fh.strftime("%d/%m %H:%M") if hasattr(fh, "strftime") else str(fh)
-                st.markdown(f"""
-                <div class="alert-card">
-                    <div class="alert-title">{a['emoji']} {a['parametro']} — {a['locacion']}</div>
-                    <div class="alert-detail">
-                        Valor: <b>{a['valor']:.2f}</b> (Rango óptimo: {a['rango_optimo']}) · {fh_str}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            render_feed_alertas(resumen["alertas_detalle"], clave=f"alertas_{planta}")
 
     # --- Gráficos por locación ---
     st.markdown("### 📍 Análisis por Locación")
@@ -690,13 +1284,14 @@ def pagina_dashboard(df: pd.DataFrame):
         return
 
     # Determinar parámetros a mostrar
-    if loc_norm in SOLO_CLORO:
+    if loc_norm in cfg["solo_cloro"]:
         params = ["Cloro Residual (mg/L)"]
     else:
         params = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
 
-    # KPIs de la locación
-    cols_kpi = st.columns(len(params))
+    # KPIs de la locación (los dispensadores suman el pronóstico de cloro)
+    fila_pronostico = pronostico[pronostico["Locación"] == loc_sel]
+    cols_kpi = st.columns(len(params) + (not fila_pronostico.empty))
     for i, param in enumerate(params):
         s = df_loc[param].dropna()
         with cols_kpi[i]:
@@ -712,22 +1307,36 @@ def pagina_dashboard(df: pd.DataFrame):
                 )
             else:
                 render_kpi_card(param, "—", "Sin datos")
-
-    # Gráficos
-    for param in params:
-        if df_loc[param].dropna().empty:
-            continue
+    if not fila_pronostico.empty:
+        p = fila_pronostico.iloc[0]
+        with cols_kpi[-1]:
+            if pd.isna(p["Horas al umbral"]):
+                render_kpi_card(f"Cloro bajo {umbral_cloro} mg/L en", "—", "Pocas muestras para estimar tendencia")
+            else:
+                tendencia = (f"decae {p['Decaimiento (%/día)']:.0f}%/día" if p["Decaimiento (%/día)"] > 0
+                             else "sin tendencia a la baja")
+                render_kpi_card(f"Cloro bajo {umbral_cloro} mg/L en", formato_horas(p["Horas al umbral"]),
+                                f"Nivel est.: {p['Nivel estimado']:.2f} mg/L · {tendencia}",
+                                estado_horas(p["Horas al umbral"]))
+
+    # Gráfico (cacheado por versión de la locación y ventana del período)
+    version_loc = huellas_de(planta, df).locaciones.get(loc_sel)
+    ventana = (len(df_loc), str(df_loc["Fecha_Hora"].iloc[0]))
+    con_datos = tuple(p for p in params if not df_loc[p].dropna().empty)
+    if con_datos:
         st.plotly_chart(
-            crear_grafico_parametro(df_loc, param),
+            figura_locacion(planta, loc_sel, con_datos, version_loc, ventana, df_loc),
             use_container_width=True,
-            key=f"chart_{loc_sel}_{param}"
+            key=f"chart_{loc_sel}"
         )
 
 
 
 
-def pagina_ingreso():
+def pagina_ingreso(planta: str = PLANTA_DEFECTO):
     """Formulario de ingreso de muestras."""
+    cfg = PLANTAS[planta]
+    solo_cloro = cfg["solo_cloro"]
     st.markdown("### ➕ Registro de Nueva Muestra")
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
 
@@ -752,14 +1361,14 @@ def pagina_ingreso():
         hora_muestra = st.time_input("🕐 Hora de toma", value=st.session_state["hora_toma_muestra"],
                                      key="hora_toma_muestra")
 
-        locacion = st.selectbox("📍 Locación", LOCACIONES)
+        locacion = st.selectbox("📍 Locación", cfg["locaciones"])
 
     with col2:
         loc_norm = locacion.strip().lower()
         ph = turbidez = ""
 
         st.markdown("**📊 Parámetros medidos**")
-        if loc_norm in SOLO_CLORO:
+        if loc_norm in solo_cloro:
             st.caption("Esta locación solo requiere medición de Cloro Residual.")
             cloro = st.number_input("Cloro Residual (mg/L)", min_value=0.0, step=0.01, format="%.2f")
         else:
@@ -771,14 +1380,14 @@ def pagina_ingreso():
     foto = st.file_uploader("📷 Adjuntar evidencia fotográfica", type=["jpg", "jpeg", "png"])
 
     # Preview de clasificación antes de guardar
-    if loc_norm not in SOLO_CLORO and ph and turbidez:
+    if loc_norm not in solo_cloro and ph and turbidez:
         st.markdown("**Vista previa de clasificación:**")
         prev_cols = st.columns(3)
         for i, (param, val) in enumerate([("pH", ph), ("Turbidez (NTU)", turbidez), ("Cloro Residual (mg/L)", cloro)]):
             with prev_cols[i]:
                 est = clasificar_valor(val, param)
                 st.markdown(f"{param}: **{val}** {render_badge(est)}", unsafe_allow_html=True)
-    elif loc_norm in SOLO_CLORO and cloro:
+    elif loc_norm in solo_cloro and cloro:
         est = clasificar_valor(cloro, "Cloro Residual (mg/L)")
         st.markdown(f"Cloro Residual: **{cloro}** {render_badge(est)}", unsafe_allow_html=True)
 
@@ -799,12 +1408,23 @@ def pagina_ingreso():
             observaciones,
             nombre_foto
         ]
-        if guardar_muestra(muestra):
+        if guardar_muestra(muestra, planta):
             st.success("✅ Muestra registrada exitosamente.")
             st.balloons()
 
 
-def pagina_historial(df: pd.DataFrame):
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _indice_historial(planta: str, version: str, _df: pd.DataFrame) -> IndiceHistorial:
+    return IndiceHistorial(_df)
+
+
+def indice_historial(planta: str, df: pd.DataFrame) -> IndiceHistorial:
+    """Índices del Historial, construidos una vez por (planta, versión de datos)."""
+    version = df.attrs.get("version") or version_datos(df)
+    return _indice_historial(planta, version, df)
+
+
+def pagina_historial(df: pd.DataFrame, planta: str = PLANTA_DEFECTO):
     """Historial filtrable con tabla estilizada."""
     st.markdown("### 📄 Historial de Muestras")
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
@@ -813,23 +1433,20 @@ def pagina_historial(df: pd.DataFrame):
         st.warning("No hay registros.")
         return
 
-    # Filtros
+    # Filtros (las opciones incluyen lo archivado, según el manifiesto)
+    indice = indice_historial(planta, df)
+    manifiesto = archivo.leer_manifiesto(directorio_archivo(planta))
     col_f1, col_f2, col_f3, col_f4 = st.columns(4)
     with col_f1:
-        locs_disp = sorted(df["Locación"].dropna().unique())
+        locs_disp = sorted(set(indice.locaciones).union(*(p["locaciones"] for p in manifiesto.values())))
         loc_hist = st.selectbox("📍 Locación", ["Todas"] + locs_disp)
     with col_f2:
-        operadores = sorted(df["Operador"].dropna().unique())
+        operadores = sorted(set(indice.operadores).union(*(p["operadores"] for p in manifiesto.values())))
         op_hist = st.selectbox("👷 Operador", ["Todos"] + list(operadores))
+    loc_q = None if loc_hist == "Todas" else loc_hist
+    op_q = None if op_hist == "Todos" else op_hist
 
-    df_f = df.copy()
-    if loc_hist != "Todas":
-        df_f = df_f[df_f["Locación"] == loc_hist]
-    if op_hist != "Todos":
-        df_f = df_f[df_f["Operador"] == op_hist]
-
-    min_fecha = df_f["Fecha_dt"].min()
-    max_fecha = df_f["Fecha_dt"].max()
+    min_fecha, max_fecha = indice.rango_disponible(indice.filtrar(loc_q, op_q))
     try:
         min_date = min_fecha.date()
         max_date = max_fecha.date()
@@ -837,32 +1454,55 @@ def pagina_historial(df: pd.DataFrame):
         min_date = max_date = datetime.now().date()
 
     with col_f3:
-        fecha_ini = st.date_input("Desde", value=min_date)
+        fecha_ini = st.date_input("Desde", value=min_date, min_value=datetime(2000, 1, 1).date())
     with col_f4:
         fecha_fin = st.date_input("Hasta", value=max_date)
 
-    df_f = df_f[
-        (df_f["Fecha_dt"] >= pd.to_datetime(fecha_ini)) &
-        (df_f["Fecha_dt"] <= pd.to_datetime(fecha_fin))
-    ]
+    # Rango anterior al tier caliente: se leen solo las particiones que se solapan
+    df_rango = con_archivo(df, pd.to_datetime(fecha_ini), pd.to_datetime(fecha_fin) + timedelta(days=1), planta)
+    if df_rango is not df:
+        indice = indice_historial(planta, df_rango)
+    posiciones = indice.filtrar(loc_q, op_q, pd.to_datetime(fecha_ini), pd.to_datetime(fecha_fin))
 
     # Columnas según locación
     loc_norm = loc_hist.strip().lower() if loc_hist != "Todas" else ""
-    if loc_norm in SOLO_CLORO:
+    if loc_norm in PLANTAS[planta]["solo_cloro"]:
         cols_show = ["Fecha", "Hora de Toma", "Operador", "Locación", "Cloro Residual (mg/L)", "Observaciones"]
     else:
         cols_show = ["Fecha", "Hora de Toma", "Operador", "Locación", "pH", "Turbidez (NTU)", "Cloro Residual (mg/L)", "Observaciones"]
-    cols_show = [c for c in cols_show if c in df_f.columns]
 
-    st.markdown(f"**{len(df_f)} registros encontrados**")
+    # Paginación keyset: el cursor se reinicia si cambia cualquier filtro o los datos
+    filtro = (planta, id(indice), loc_hist, op_hist, fecha_ini, fecha_fin)
+    estado = st.session_state.get("hist_cursor")
+    if not estado or estado["filtro"] != filtro:
+        estado = {"filtro": filtro, "cursor": None, "direccion": "siguiente"}
+    visibles, inicio = IndiceHistorial.pagina(posiciones, estado["cursor"], estado["direccion"])
+    total = len(posiciones)
+    n_paginas = max(1, -(-total // TAMANO_PAGINA))
+    pagina_actual = inicio // TAMANO_PAGINA + 1
+
+    def mover(direccion: str, cursor: int):
+        st.session_state["hist_cursor"] = {"filtro": filtro, "cursor": cursor, "direccion": direccion}
+
+    col_info, col_prev, col_next = st.columns([4, 1, 1])
+    with col_info:
+        st.markdown(f"**{total} registros encontrados** · Página {pagina_actual} de {n_paginas}")
+    with col_prev:
+        st.button("◀ Anterior", use_container_width=True, disabled=inicio == 0,
+                  on_click=mover, args=("anterior", int(visibles[0]) if len(visibles) else None))
+    with col_next:
+        st.button("Siguiente ▶", use_container_width=True, disabled=inicio + len(visibles) >= total,
+                  on_click=mover, args=("siguiente", int(visibles[-1]) if len(visibles) else None))
+
     st.dataframe(
-        df_f[cols_show].sort_values("Fecha", ascending=False),
+        indice.materializar(visibles, cols_show),
         use_container_width=True,
-        height=500,
+        hide_index=True,
+        height=min(500, 38 + 35 * max(1, len(visibles))),
     )
 
 
-def pagina_exportar(df: pd.DataFrame):
+def pagina_exportar(df: pd.DataFrame, planta: str = PLANTA_DEFECTO):
     """Exportación de datos en múltiples formatos."""
     st.markdown("### 📥 Exportar Datos")
     st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
@@ -871,11 +1511,20 @@ def pagina_exportar(df: pd.DataFrame):
         st.info("No hay datos para exportar.")
         return
 
+    # La exportación incluye todo el histórico archivado
+    n_caliente = len(df)
+    df = con_archivo(df, planta=planta)
+    if len(df) > n_caliente:
+        st.caption(f"Incluye {len(df) - n_caliente} registros del archivo histórico.")
+
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("**📊 Reporte Excel completo**")
         st.caption("Incluye: registros, resumen por locación y alertas.")
-        excel_data = generar_reporte_excel(df)
+        resumen = resumen_locaciones(df, planta)
+        excel_data = agregado_compartido(df, f"reporte_excel:{planta}",
+                                         lambda: generar_reporte_excel(df, PLANTAS[planta]["solo_cloro"], resumen).getvalue(),
+                                         ttl=300)
         st.download_button(
             "⬇️ Descargar Excel (.xlsx)",
             data=excel_data,
@@ -896,6 +1545,170 @@ def pagina_exportar(df: pd.DataFrame):
         )
 
 
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _motor_analisis(planta: str, version: str, _df: pd.DataFrame) -> MotorAnalisis:
+    """Motor DuckDB con Sheet + archivo histórico; uno por versión de datos."""
+    return MotorAnalisis(con_archivo(_df, planta=planta), LIMITES)
+
+
+def motor_analisis(planta: str, df: pd.DataFrame) -> tuple:
+    """``(motor, versión)``: la versión combina la del tier caliente y la del manifiesto del archivo."""
+    manifiesto = archivo.leer_manifiesto(directorio_archivo(planta))
+    version = f"{df.attrs.get('version') or version_datos(df)}:{archivo.version_manifiesto(manifiesto)}"
+    return _motor_analisis(planta, version, df), version
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def consulta_analisis(planta: str, version: str, agrupar: tuple, periodo: str, filtros: tuple,
+                      desde, hasta, _motor: MotorAnalisis) -> pd.DataFrame:
+    """Resultado de una consulta del motor, cacheado por versión de datos y parámetros."""
+    return _motor.consultar(list(agrupar), periodo, dict(filtros), desde, hasta)
+
+
+def pagina_analisis(df: pd.DataFrame, planta: str = PLANTA_DEFECTO):
+    """Cumplimiento y estadísticas agrupando y filtrando por cualquier dimensión."""
+    st.markdown("### 🔎 Análisis")
+    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+
+    if df.empty:
+        st.info("No hay datos para analizar.")
+        return
+
+    with st.spinner("Preparando motor de análisis…"):
+        motor, version = motor_analisis(planta, df)
+    if not len(motor):
+        st.info("No hay mediciones para analizar.")
+        return
+
+    # --- Agrupación ---
+    col_grupo, col_periodo, col_pivot = st.columns([2, 1, 1])
+    with col_grupo:
+        agrupar = st.multiselect("Agrupar por", list(DIMENSIONES), default=["Parámetro", "Locación"])
+    with col_periodo:
+        periodo = st.selectbox("Período", ["Sin período"] + list(PERIODOS), index=3)
+    periodo = None if periodo == "Sin período" else periodo
+    columnas_grupo = (["Período"] if periodo else []) + agrupar
+    with col_pivot:
+        pivot = st.selectbox("Columnas (pivot)", ["Ninguna"] + columnas_grupo,
+                             disabled=len(columnas_grupo) < 2,
+                             help="Muestra el % de cumplimiento con esta dimensión como columnas.")
+
+    # --- Filtros ---
+    col_f1, col_f2, col_f3, col_f4 = st.columns(4)
+    filtros = {}
+    for col, dim in zip([col_f1, col_f2, col_f3], DIMENSIONES):
+        with col:
+            filtros[dim] = tuple(st.multiselect(dim, motor.opciones[dim], placeholder="Todas"))
+    with col_f4:
+        rango = st.date_input("Rango de fechas", value=(motor.desde, motor.hasta),
+                              min_value=motor.desde, max_value=motor.hasta)
+    desde, hasta = (rango[0], rango[1]) if len(rango) == 2 else (rango[0], rango[0])
+
+    t0 = time.perf_counter()
+    resultado = consulta_analisis(planta, version, tuple(agrupar), periodo,
+                                  tuple((k, v) for k, v in filtros.items() if v), desde, hasta, motor)
+    ms = (time.perf_counter() - t0) * 1000
+
+    st.caption(f"**{len(resultado)} grupos** · {len(motor):,} mediciones analizadas · consulta en {ms:.0f} ms")
+    if resultado.empty:
+        st.info("Sin mediciones para los filtros seleccionados.")
+        return
+
+    if "% Cumplimiento" not in resultado.columns:
+        st.info("El cumplimiento se calcula por parámetro: agrupa por **Parámetro** o filtra uno solo "
+                "para ver porcentajes y estadísticas.")
+    if pivot != "Ninguna" and len(columnas_grupo) >= 2 and "% Cumplimiento" in resultado.columns:
+        filas = [c for c in columnas_grupo if c != pivot]
+        tabla = resultado.pivot_table(index=filas, columns=pivot, values="% Cumplimiento")
+        st.markdown("**% Cumplimiento**")
+        st.dataframe(tabla, use_container_width=True)
+    else:
+        st.dataframe(
+            resultado, use_container_width=True, hide_index=True,
+            column_config={"% Cumplimiento": st.column_config.ProgressColumn(
+                "% Cumplimiento", format="%.1f%%", min_value=0, max_value=100)},
+        )
+
+    st.download_button(
+        "⬇️ Descargar resultado CSV",
+        data=resultado.to_csv(index=False).encode("utf-8"),
+        file_name=f"PTAP_Analisis_{datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv",
+    )
+
+
+def resumen_consolidado(datos: dict, dias: int) -> dict:
+    """KPIs por planta y totales de todas las plantas, sobre los snapshots ya cargados."""
+    filas, recientes = [], []
+    ahora = datetime.now()
+    for planta, df in datos.items():
+        cfg = PLANTAS[planta]
+        r = resumen_ejecutivo(df, dias, cfg["solo_cloro"])
+        filas.append({
+            "Planta": cfg["nombre"],
+            "Muestras": r["total_muestras"],
+            "Locaciones activas": f"{r['locaciones_activas']}/{len(cfg['locaciones'])}",
+            **{f"% {p}": v for p, v in r["cumplimiento"].items()},
+            "Alertas críticas": r["alertas_criticas"],
+            "Alertas": r["alertas_total"],
+        })
+        recientes.append(df[df["Fecha_Hora"] >= ahora - timedelta(days=dias)])
+
+    total = resumen_ejecutivo(pd.concat(recientes, ignore_index=True), dias) if recientes else None
+    return {
+        "plantas": pd.DataFrame(filas),
+        "total_muestras": sum(f["Muestras"] for f in filas),
+        "alertas_criticas": sum(f["Alertas críticas"] for f in filas),
+        "alertas_total": sum(f["Alertas"] for f in filas),
+        "cumplimiento": total["cumplimiento"] if total else {},
+    }
+
+
+def pagina_consolidado():
+    """Vista ejecutiva consolidada de todas las plantas."""
+    st.markdown("### 🏭 Vista Consolidada de Plantas")
+    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+
+    col_periodo, _ = st.columns([1, 3])
+    with col_periodo:
+        dias = st.selectbox("📅 Período", [7, 15, 30], index=2, format_func=lambda d: f"Últimos {d} días",
+                            key="periodo_consolidado")
+
+    # Snapshots de todas las plantas en paralelo; una planta caída no bloquea al resto
+    datos, errores = leer_plantas()
+    for planta, error in errores.items():
+        st.warning(f"⚠️ {PLANTAS[planta]['nombre']}: sin conexión ({error})")
+    datos = {p: df for p, df in datos.items() if not df.empty}
+    if not datos:
+        st.info("No hay datos registrados aún.")
+        return
+
+    version = "+".join(f"{p}={df.attrs.get('version')}" for p, df in sorted(datos.items()))
+    resumen = get_cache().derivado(f"consolidado:{dias}", version,
+                                   lambda: resumen_consolidado(datos, dias), ttl=60)
+
+    k1, k2, k3, k4 = st.columns(4)
+    with k1:
+        render_kpi_card("Plantas Monitoreadas", f"{len(datos)}/{len(PLANTAS)}",
+                        "Con datos disponibles", variante="kpi-blue")
+    with k2:
+        render_kpi_card("Muestras Registradas", str(resumen["total_muestras"]),
+                        f"Últimos {dias} días", variante="kpi-blue")
+    with k3:
+        cumpl_cloro = resumen["cumplimiento"].get("Cloro Residual (mg/L)")
+        est_cloro = "ok" if cumpl_cloro and cumpl_cloro >= 90 else ("warn" if cumpl_cloro and cumpl_cloro >= 70 else "crit")
+        render_kpi_card("Cumpl. Cloro Residual",
+                        f"{cumpl_cloro}%" if cumpl_cloro is not None else "—",
+                        "Todas las plantas", est_cloro)
+    with k4:
+        est_alertas = "ok" if resumen["alertas_criticas"] == 0 else "crit"
+        render_kpi_card("Alertas Críticas (48h)", str(resumen["alertas_criticas"]),
+                        f"{resumen['alertas_total']} alertas totales", est_alertas)
+
+    st.markdown('<hr class="section-divider">', unsafe_allow_html=True)
+    st.dataframe(resumen["plantas"], use_container_width=True, hide_index=True)
+
+
 # ═══════════════════════════════════════════════════════════════
 # SIDEBAR Y NAVEGACIÓN
 # ═══════════════════════════════════════════════════════════════
@@ -905,6 +1718,11 @@ def render_sidebar():
         st.image(LOGO_URL, width=180)
         st.markdown("---")
 
+        # Selector de planta (solo si hay más de una registrada)
+        if len(PLANTAS) > 1:
+            st.selectbox("🏭 Planta", list(PLANTAS), key="planta",
+                         format_func=lambda p: PLANTAS[p]["nombre"])
+
         # Menú según autenticación
         if st.session_state.get("logueado"):
             usuario = st.session_state.get("usuario", "")
@@ -913,9 +1731,11 @@ def render_sidebar():
             st.markdown(f"👤 **{nombre}**")
             st.caption(f"Rol: {rol.capitalize()}")
             st.markdown("---")
-            opciones = ["📊 Dashboard", "➕ Ingreso de Muestra", "📄 Historial", "📥 Exportar"]
+            opciones = ["📊 Dashboard", "➕ Ingreso de Muestra", "📄 Historial", "🔎 Análisis", "📥 Exportar"]
         else:
             opciones = ["📊 Dashboard"]
+        if len(PLANTAS) > 1:
+            opciones.insert(1, "🏭 Consolidado")
 
         menu = st.radio("Navegación", opciones, label_visibility="collapsed")
 
@@ -933,6 +1753,17 @@ def render_sidebar():
                 st.session_state["menu"] = "login"
                 st.rerun()
 
+        # Muestras aún no replicadas al Sheet
+        pendientes = sum(get_wal(p).pendientes for p in PLANTAS)
+        if pendientes:
+            st.caption(f"⏳ {pendientes} muestra(s) pendiente(s) de sincronizar")
+        for p in PLANTAS:
+            fallo = ultimo_error_snapshot(p)
+            if fallo:
+                momento = datetime.fromtimestamp(fallo["momento"], TIMEZONE)
+                st.caption(f"⚠️ Snapshot ({fallo['origen']}, {momento:%d/%m %H:%M}): "
+                           f"{fallo['mensaje']}")
+
         # Timestamp
         st.markdown("---")
         now = datetime.now(TIMEZONE)
@@ -984,7 +1815,8 @@ def main():
     )
 
     # Inicializar session state
-    defaults = {"logueado": False, "show_login": False, "menu": "📊 Dashboard", "usuario": ""}
+    defaults = {"logueado": False, "show_login": False, "menu": "📊 Dashboard", "usuario": "",
+                "planta": PLANTA_DEFECTO}
     for k, v in defaults.items():
         if k not in st.session_state:
             st.session_state[k] = v
@@ -994,35 +1826,48 @@ def main():
         pagina_login()
         st.stop()
 
+    # Reenviar muestras que quedaron en el log local
+    for p in PLANTAS:
+        sincronizar_pendientes(p)
+
     # Sidebar
     menu = render_sidebar()
 
     # Header
     render_header()
 
+    # Router (la vista consolidada carga todas las plantas por su cuenta)
+    planta = st.session_state.get("planta", PLANTA_DEFECTO)
+    if menu == "🏭 Consolidado":
+        pagina_consolidado()
+        return
+
     # Cargar datos
-    df = leer_datos()
+    df = leer_datos(planta)
 
-    # Router
     if menu == "📊 Dashboard":
         if df.empty:
             st.info("No hay datos registrados aún.")
         else:
-            pagina_dashboard(df)
+            pagina_dashboard(df, planta)
 
     elif menu == "➕ Ingreso de Muestra":
         if st.session_state.get("logueado"):
-            pagina_ingreso()
+            pagina_ingreso(planta)
         else:
             st.warning("Inicia sesión para registrar muestras.")
 
     elif menu == "📄 Historial":
         if st.session_state.get("logueado"):
-            pagina_historial(df)
+            pagina_historial(df, planta)
+
+    elif menu == "🔎 Análisis":
+        if st.session_state.get("logueado"):
+            pagina_analisis(df, planta)
 
     elif menu == "📥 Exportar":
         if st.session_state.get("logueado"):
-            pagina_exportar(df)
+            pagina_exportar(df, planta)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,420 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Importación masiva de registros históricos              ║
+║  CSV / XLSX por bloques, validación vectorizada, reanudable     ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Carga años de registros de laboratorio sin pasar por el formulario:
+
+    python ptap_importar.py ptap_data.csv
+    python ptap_importar.py historico_2019_2023.xlsx --planta ptap-principal --lote 500
+    python ptap_importar.py respaldo.csv --validar            # solo valida, no escribe
+    python ptap_importar.py respaldo.csv --simulado --fallos 0.2
+
+- Columnas antiguas se renombran (``Hora`` → ``Hora de Toma``, ``Técnico`` → ``Operador``).
+- Cada bloque se valida contra ``LIMITES`` con operaciones vectorizadas; las filas
+  rechazadas van a ``<archivo>.rechazados.csv`` con su motivo.
+- Duplicados por clave natural (fecha, hora de toma, operador, locación) se
+  descartan, tanto contra el Sheet + archivo histórico como dentro del archivo.
+- Las filas se envían con ``append_rows`` por lotes. Cada una lleva un ``ID
+  Registro`` derivado de su clave: si una respuesta se pierde, el reintento no duplica.
+- Un checkpoint JSON guarda cuántas filas del archivo ya se procesaron; al
+  relanzar el mismo comando se continúa desde ahí.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from datetime import time as hora_t
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import ptap_dashboard as app
+from ptap_wal import COL_ID
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+DIR_CHECKPOINT = Path("datos_locales")
+TAMANO_BLOQUE = 5000      # filas leídas del archivo por vez
+LOTE_ENVIO = 500          # filas por append_rows
+REINTENTOS = 5
+
+# Encabezados antiguos → columnas que espera leer_datos
+MAPEO_COLUMNAS = {
+    "Hora": "Hora de Toma",
+    "Técnico": "Operador",
+    "Tecnico": "Operador",
+}
+COLUMNAS_HOJA = [
+    "Fecha", "Hora de Toma", "Hora de Registro", "Operador", "Locación",
+    "pH", "Turbidez (NTU)", "Cloro Residual (mg/L)", "Observaciones", "Foto",
+]
+COLUMNAS_CLAVE = ["Fecha", "Hora de Toma", "Operador", "Locación"]
+PARAMS = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# LECTURA POR BLOQUES
+# ═══════════════════════════════════════════════════════════════
+def _texto_celda(valor) -> str:
+    """Celdas de Excel a texto con el mismo formato que el Sheet."""
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        return valor.strftime("%Y-%m-%d") if valor.time() == hora_t(0) else valor.strftime("%Y-%m-%d %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%Y-%m-%d")
+    if isinstance(valor, hora_t):
+        return valor.strftime("%H:%M")
+    return str(valor)
+
+
+def contar_filas(ruta: Path) -> int:
+    """Filas de datos del archivo (aproximado en CSV con saltos de línea dentro de celdas)."""
+    if ruta.suffix.lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(ruta, read_only=True)
+        try:
+            return max(0, (wb.active.max_row or 1) - 1)
+        finally:
+            wb.close()
+    with open(ruta, "rb") as f:
+        return max(0, sum(bloque.count(b"\n") for bloque in iter(lambda: f.read(1 << 20), b"")) - 1)
+
+
+def leer_bloques(ruta: Path, tamano: int = TAMANO_BLOQUE, saltar: int = 0):
+    """Genera DataFrames de texto de ``tamano`` filas, omitiendo las primeras ``saltar``."""
+    if ruta.suffix.lower() in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = wb.active.iter_rows(values_only=True)
+            encabezados = [_texto_celda(c).strip() for c in next(filas, ())]
+            bloque = []
+            for i, fila in enumerate(filas):
+                if i < saltar:
+                    continue
+                bloque.append([_texto_celda(c) for c in fila[:len(encabezados)]])
+                if len(bloque) == tamano:
+                    yield pd.DataFrame(bloque, columns=encabezados)
+                    bloque = []
+            if bloque:
+                yield pd.DataFrame(bloque, columns=encabezados)
+        finally:
+            wb.close()
+        return
+    yield from pd.read_csv(ruta, dtype=str, keep_default_na=False, chunksize=tamano,
+                           skiprows=range(1, saltar + 1), encoding="utf-8-sig")
+
+
+# ═══════════════════════════════════════════════════════════════
+# NORMALIZACIÓN Y VALIDACIÓN (VECTORIZADAS)
+# ═══════════════════════════════════════════════════════════════
+def _fechas(s: pd.Series) -> pd.Series:
+    """ISO primero; el resto (p. ej. ``dd/mm/aaaa`` del laboratorio) con día primero."""
+    iso = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    resto = iso.isna() & s.ne("")
+    if resto.any():
+        iso[resto] = pd.to_datetime(s[resto], dayfirst=True, format="mixed", errors="coerce")
+    return iso
+
+
+def _horas(s: pd.Series) -> pd.Series:
+    """Hora de toma normalizada a ``HH:MM`` (NaN si no se puede interpretar)."""
+    t = pd.to_datetime(s, format="%H:%M", errors="coerce")
+    for formato in ("%H:%M:%S", "mixed"):
+        resto = t.isna() & s.ne("")
+        if not resto.any():
+            break
+        t[resto] = pd.to_datetime(s[resto], format=formato, errors="coerce")
+    return t.dt.strftime("%H:%M")
+
+
+def normalizar(bloque: pd.DataFrame) -> pd.DataFrame:
+    """Renombra columnas antiguas, completa las faltantes y limpia texto y números."""
+    df = bloque.rename(columns=MAPEO_COLUMNAS)
+    df = df.loc[:, ~df.columns.duplicated()]
+    for col in COLUMNAS_HOJA:
+        if col not in df.columns:
+            df[col] = ""
+    df = df[COLUMNAS_HOJA].astype(str).apply(lambda c: c.str.strip())
+    df["_fecha"] = _fechas(df["Fecha"])
+    df["Fecha"] = df["_fecha"].dt.strftime("%Y-%m-%d")
+    df["Hora de Toma"] = _horas(df["Hora de Toma"])
+    for param in PARAMS:
+        df[f"_{param}"] = pd.to_numeric(df[param].str.replace(",", ".", regex=False).replace("", np.nan),
+                                        errors="coerce")
+    return df
+
+
+def validar(df: pd.DataFrame, locaciones: list, aceptar_locaciones: bool = False,
+            rechazar_criticos: bool = False) -> tuple:
+    """
+    Motivo de rechazo por fila (``""`` = válida) y conteo de valores en alerta y
+    críticos según ``LIMITES``. Todas las reglas son operaciones sobre columnas.
+    """
+    motivo = pd.Series("", index=df.index)
+
+    def regla(condicion, texto):
+        nonlocal motivo
+        motivo = motivo.mask(condicion & motivo.eq(""), texto)
+
+    conocidas = {loc.strip().lower() for loc in locaciones}
+    regla(df["_fecha"].isna(), "fecha inválida")
+    regla(df["Hora de Toma"].isna(), "hora inválida")
+    regla(df["Locación"].eq(""), "sin locación")
+    if not aceptar_locaciones:
+        regla(~df["Locación"].str.lower().isin(conocidas), "locación desconocida")
+    for param in PARAMS:
+        texto, valor = df[param], df[f"_{param}"]
+        regla(texto.ne("") & valor.isna(), f"{param}: no numérico")
+        regla(valor < 0, f"{param}: negativo")
+    regla(df["_pH"] > 14, "pH: fuera de 0–14")
+    regla(df[[f"_{p}" for p in PARAMS]].isna().all(axis=1), "sin mediciones")
+
+    niveles = {}
+    for param in PARAMS:
+        estado = app.clasificar_serie(df[f"_{param}"], param)
+        niveles[param] = {"warn": int((estado == "warn").sum()), "crit": int((estado == "crit").sum())}
+        if rechazar_criticos:
+            regla(pd.Series(estado == "crit", index=df.index), f"{param}: crítico según LIMITES")
+    return motivo, niveles
+
+
+def claves_naturales(df: pd.DataFrame) -> np.ndarray:
+    """Hash de (fecha, hora de toma, operador, locación) ya normalizados."""
+    clave = df[COLUMNAS_CLAVE].astype(str).apply(lambda c: c.str.strip())
+    clave["Operador"] = clave["Operador"].str.lower()
+    clave["Locación"] = clave["Locación"].str.lower()
+    return pd.util.hash_pandas_object(clave, index=False).to_numpy()
+
+
+def claves_existentes(ws, planta: str, espera: float = 1.0) -> set:
+    """Claves de lo que ya está en el Sheet y en el archivo histórico de la planta."""
+    hoja = app.procesar_registros(pd.DataFrame(_reintentar(ws.get_all_records, espera=espera)))
+    df = app.con_archivo(hoja, planta=planta)
+    if df.empty:
+        return set()
+    df = normalizar(df.drop(columns=["Fecha_dt", "Fecha_Hora"], errors="ignore"))
+    return set(claves_naturales(df).tolist())
+
+
+def filas_hoja(df: pd.DataFrame, claves: np.ndarray) -> list:
+    """Filas en el orden del Sheet, con números como float y la clave de idempotencia."""
+    salida = df[COLUMNAS_HOJA].copy()
+    for param in PARAMS:
+        salida[param] = df[f"_{param}"].astype(object).where(df[f"_{param}"].notna(), "")
+    filas = salida.values.tolist()
+    return [f + [""] * (COL_ID - 1 - len(f)) + [f"imp-{int(c):016x}"] for f, c in zip(filas, claves)]
+
+
+# ═══════════════════════════════════════════════════════════════
+# ENVÍO Y CHECKPOINT
+# ═══════════════════════════════════════════════════════════════
+def _reintentar(llamada, reintentos: int = REINTENTOS, espera: float = 1.0):
+    """Lectura con reintentos y espera exponencial."""
+    for intento in range(reintentos):
+        try:
+            return llamada()
+        except Exception:
+            if intento == reintentos - 1:
+                raise
+            time.sleep(min(espera * 2 ** intento, 30))
+
+
+def enviar_lote(ws, filas: list, reintentos: int = REINTENTOS, espera: float = 1.0) -> int:
+    """
+    ``append_rows`` con reintentos. Antes de reintentar se leen los ``ID Registro``
+    del Sheet: si la escritura anterior llegó pero su respuesta no, no se repite.
+    """
+    for intento in range(reintentos):
+        try:
+            if intento:
+                time.sleep(min(espera * 2 ** (intento - 1), 30))
+                presentes = set(ws.col_values(COL_ID))
+                filas = [f for f in filas if f[COL_ID - 1] not in presentes]
+                if not filas:
+                    return intento
+            ws.append_rows(filas)
+            return intento
+        except Exception:
+            if intento == reintentos - 1:
+                raise
+    return reintentos
+
+
+def ruta_checkpoint(archivo: Path) -> Path:
+    return DIR_CHECKPOINT / f"importacion-{archivo.stem}.json"
+
+
+def _firma(archivo: Path) -> dict:
+    st_ = archivo.stat()
+    return {"archivo": str(archivo.resolve()), "tamano": st_.st_size, "mtime": st_.st_mtime}
+
+
+def leer_checkpoint(ruta: Path, archivo: Path) -> dict:
+    """Checkpoint del mismo archivo (mismo tamaño y fecha de modificación), o uno vacío (también sin ``ruta``)."""
+    vacio = {**_firma(archivo), "filas": 0, "insertadas": 0, "duplicadas": 0, "rechazadas": 0}
+    if ruta is None:
+        return vacio
+    try:
+        datos = json.loads(ruta.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return vacio
+    if any(datos.get(k) != v for k, v in _firma(archivo).items()):
+        return vacio
+    return {**vacio, **datos}
+
+
+def guardar_checkpoint(ruta: Path, datos: dict):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_suffix(".tmp")
+    tmp.write_text(json.dumps(datos, indent=2), encoding="utf-8")
+    os.replace(tmp, ruta)
+
+
+# ═══════════════════════════════════════════════════════════════
+# IMPORTACIÓN
+# ═══════════════════════════════════════════════════════════════
+def importar(archivo: Path, ws, planta: str = app.PLANTA_DEFECTO, tamano: int = TAMANO_BLOQUE,
+             lote: int = LOTE_ENVIO, checkpoint: Path = None, solo_validar: bool = False,
+             aceptar_locaciones: bool = False, rechazar_criticos: bool = False,
+             espera: float = 1.0) -> dict:
+    """Importa ``archivo`` al worksheet ``ws``. Retorna el estado final del checkpoint."""
+    archivo = Path(archivo)
+    checkpoint = checkpoint or ruta_checkpoint(archivo)
+    # La validación no guarda checkpoint: siempre recorre el archivo completo
+    estado = leer_checkpoint(None if solo_validar else checkpoint, archivo)
+    total = contar_filas(archivo)
+    rechazos = archivo.with_name(f"{archivo.stem}.rechazados.csv")
+    if estado["filas"]:
+        print(f"Reanudando desde la fila {estado['filas']} de {total}.")
+    elif rechazos.exists():
+        rechazos.unlink()
+
+    vistas = claves_existentes(ws, planta, espera) if not solo_validar else set()
+    locaciones = app.PLANTAS[planta]["locaciones"]
+    niveles_total = {p: {"warn": 0, "crit": 0} for p in PARAMS}
+    t0, procesadas_sesion = time.perf_counter(), 0
+
+    for bloque in leer_bloques(archivo, tamano, saltar=estado["filas"]):
+        inicio = estado["filas"]
+        df = normalizar(bloque)
+        motivo, niveles = validar(df, locaciones, aceptar_locaciones, rechazar_criticos)
+        for p in PARAMS:
+            for k in ("warn", "crit"):
+                niveles_total[p][k] += niveles[p][k]
+
+        malas = motivo.ne("").to_numpy()
+        validas = df[~malas]
+        claves = claves_naturales(validas)
+        # Duplicados contra lo existente y dentro del propio archivo (primera aparición gana)
+        nuevas = np.zeros(len(claves), dtype=bool)
+        for i, c in enumerate(claves.tolist()):
+            if c not in vistas:
+                vistas.add(c)
+                nuevas[i] = True
+        posiciones = np.flatnonzero(~malas)[nuevas]
+        duplicadas = np.zeros(len(bloque), dtype=bool)
+        duplicadas[np.flatnonzero(~malas)[~nuevas]] = True
+
+        # Rechazos y duplicados se registran solo hasta la posición que se guarda en el
+        # checkpoint: al reanudar a mitad de bloque no se cuentan ni escriben dos veces
+        registradas = 0
+
+        def avanzar(hasta: int):
+            nonlocal registradas
+            tramo = slice(registradas, hasta)
+            if malas[tramo].any():
+                indices = np.flatnonzero(malas[tramo]) + registradas
+                salida = bloque.iloc[indices].assign(Motivo=motivo.iloc[indices].to_numpy(),
+                                                     Fila=indices + inicio + 2)
+                salida.to_csv(rechazos, mode="a", header=not rechazos.exists(), index=False)
+            estado["rechazadas"] += int(malas[tramo].sum())
+            estado["duplicadas"] += int(duplicadas[tramo].sum())
+            estado["filas"] = inicio + hasta
+            registradas = hasta
+
+        if solo_validar:
+            avanzar(len(bloque))
+        else:
+            filas = filas_hoja(validas[nuevas], claves[nuevas])
+            for j in range(0, len(filas), lote):
+                enviar_lote(ws, filas[j:j + lote], espera=espera)
+                estado["insertadas"] += len(filas[j:j + lote])
+                avanzar(int(posiciones[min(j + lote, len(filas)) - 1]) + 1)
+                guardar_checkpoint(checkpoint, estado)
+            avanzar(len(bloque))
+            guardar_checkpoint(checkpoint, estado)
+
+        procesadas_sesion += len(bloque)
+        ritmo = procesadas_sesion / max(time.perf_counter() - t0, 1e-9)
+        print(f"  {estado['filas']:>9,}/{total:,} filas · {estado['insertadas']:,} nuevas · "
+              f"{estado['duplicadas']:,} duplicadas · {estado['rechazadas']:,} rechazadas · "
+              f"{ritmo:,.0f} filas/s", flush=True)
+
+    estado["niveles"] = niveles_total
+    if not solo_validar:
+        guardar_checkpoint(checkpoint, {**estado, "completado": True})
+        app.invalidar_muestras(planta)
+    return estado
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Importación masiva de registros históricos (CSV / XLSX).")
+    parser.add_argument("archivo", type=Path)
+    parser.add_argument("--planta", default=app.PLANTA_DEFECTO, choices=list(app.PLANTAS))
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas leídas del archivo por vez")
+    parser.add_argument("--lote", type=int, default=LOTE_ENVIO, help="Filas por append_rows")
+    parser.add_argument("--checkpoint", type=Path, help="Ruta del checkpoint (por defecto en datos_locales/)")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignorar el checkpoint y empezar de cero")
+    parser.add_argument("--validar", action="store_true", help="Solo validar; no escribe en el Sheet")
+    parser.add_argument("--aceptar-locaciones", action="store_true", help="Aceptar locaciones fuera del registro de la planta")
+    parser.add_argument("--rechazar-criticos", action="store_true", help="Rechazar filas con valores críticos según LIMITES")
+    parser.add_argument("--simulado", action="store_true", help="Importar a un Sheet simulado en memoria")
+    parser.add_argument("--fallos", type=float, default=0.0, help="Con --simulado: probabilidad de fallo por llamada")
+    args = parser.parse_args(argv)
+
+    if not args.archivo.exists():
+        print(f"No existe {args.archivo}", file=sys.stderr)
+        return 1
+    checkpoint = args.checkpoint or ruta_checkpoint(args.archivo)
+    if args.reiniciar:
+        checkpoint.unlink(missing_ok=True)
+
+    if args.simulado:
+        from ptap_simulacion import HojaSimulada
+        ws = HojaSimulada(prob_fallo=args.fallos, prob_respuesta_perdida=args.fallos, semilla=1)
+        espera = 0.0
+    else:
+        ws = app.get_worksheet(app.PLANTAS[args.planta]["sheet_url"])
+        espera = 1.0
+
+    t0 = time.perf_counter()
+    try:
+        estado = importar(args.archivo, ws, args.planta, args.bloque, args.lote, checkpoint,
+                          args.validar, args.aceptar_locaciones, args.rechazar_criticos, espera)
+    except Exception as e:
+        print(f"\nImportación interrumpida: {e}\nVuelva a ejecutar el mismo comando para continuar.",
+              file=sys.stderr)
+        return 1
+
+    print(f"\n{'Validadas' if args.validar else 'Importadas'}: {estado['filas']:,} filas en "
+          f"{time.perf_counter() - t0:.1f}s · {estado['insertadas']:,} nuevas · "
+          f"{estado['duplicadas']:,} duplicadas · {estado['rechazadas']:,} rechazadas")
+    for param, n in estado["niveles"].items():
+        print(f"  {param:<24} {n['warn']:>7,} en alerta · {n['crit']:>7,} críticos")
+    if estado["rechazadas"]:
+        print(f"Detalle de rechazos: {args.archivo.with_name(args.archivo.stem + '.rechazados.csv')}")
+    if args.simulado:
+        print(f"Sheet simulado: {len(ws.filas):,} filas · llamadas {dict(ws.llamadas)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Pronóstico de decaimiento de cloro residual             ║
+║  Tendencia log-lineal por dispensador, ajuste incremental       ║
+╚══════════════════════════════════════════════════════════════════╝
+
+En los dispensadores el cloro residual decae aproximadamente exponencial:
+``C(t) = C0 · e^(b·t)``. Por locación se ajusta ``ln C`` contra el tiempo por
+mínimos cuadrados ponderados, con pesos que se reducen a la mitad cada
+``VIDA_MEDIA_DIAS`` (las muestras viejas pesan cada vez menos). El ajuste solo
+necesita seis sumas por locación (estadísticos suficientes):
+
+    S0 = Σw   St = Σw·t   Sy = Σw·y   Stt = Σw·t²   Sty = Σw·t·y   N
+
+Con muestras nuevas se suman sus términos; las filas ya incorporadas no se
+vuelven a leer. Si una locación tuvo ediciones o borrados en filas viejas se
+reajusta desde cero. Todas las locaciones afectadas se procesan en un único
+lote vectorizado (``np.bincount`` por código de locación).
+"""
+import numpy as np
+import pandas as pd
+
+VIDA_MEDIA_DIAS = 7.0     # una muestra de hace una semana pesa la mitad
+MIN_MUESTRAS = 3
+PISO_CLORO = 0.01         # mg/L; evita log(0) en lecturas nulas
+NS_DIA = 86_400 * 10**9
+SIN_FECHA = np.iinfo(np.int64).min
+COLUMNA = "Cloro Residual (mg/L)"
+
+
+def _sumas(codigos: np.ndarray, t: np.ndarray, y: np.ndarray, w: np.ndarray, n: int) -> np.ndarray:
+    """Estadísticos suficientes ``(n, 6)`` de las filas ``codigos`` en una pasada."""
+    return np.stack([
+        np.bincount(codigos, w, n), np.bincount(codigos, w * t, n), np.bincount(codigos, w * y, n),
+        np.bincount(codigos, w * t * t, n), np.bincount(codigos, w * t * y, n),
+        np.bincount(codigos, minlength=n).astype(float),
+    ], axis=1)
+
+
+class PronosticoCloro:
+    """Estadísticos por locación, referidos al instante de la última muestra (``t <= 0``)."""
+
+    def __init__(self, umbral: float, vida_media: float = VIDA_MEDIA_DIAS):
+        self.umbral = umbral
+        self.vida_media = vida_media
+        self.referencia = None               # ns de la muestra más reciente incorporada
+        self.locaciones = []
+        self.stats = np.zeros((0, 6))
+        self.huella = np.zeros(0, dtype=np.uint64)   # suma de huellas de las filas incorporadas
+        self.filas = np.zeros(0, dtype=np.int64)
+        self.ultima = np.zeros(0, dtype=np.int64)    # ns de la última muestra por locación
+        self.versiones = {}
+
+    def _desplazar(self, referencia: int):
+        """Mueve el origen de tiempo a ``referencia`` y envejece los pesos acumulados."""
+        if self.referencia is None:
+            self.referencia = referencia
+            return
+        if referencia <= self.referencia:
+            return
+        d = (referencia - self.referencia) / NS_DIA
+        s0, st, sy, stt, sty, n = self.stats.T
+        factor = np.exp2(-d / self.vida_media)
+        self.stats = np.stack([s0 * factor, (st - d * s0) * factor, sy * factor,
+                               (stt - 2 * d * st + d * d * s0) * factor, (sty - d * sy) * factor, n], axis=1)
+        self.referencia = referencia
+
+    def actualizar(self, df: pd.DataFrame, huellas: np.ndarray, versiones: dict, solo_cloro: set) -> dict:
+        """
+        Incorpora las muestras de las locaciones ``solo_cloro`` cuya versión cambió.
+        ``huellas`` es la huella por fila de ``df`` y ``versiones`` la versión por
+        locación (``Huellas.filas`` y ``Huellas.locaciones``). Retorna qué
+        locaciones se ajustaron incremental o completamente.
+        """
+        resultado = {"incrementales": [], "completas": []}
+        vigentes = {loc for loc in versiones if loc.strip().lower() in solo_cloro}
+        if any(loc not in vigentes for loc in self.locaciones):
+            quedan = [i for i, loc in enumerate(self.locaciones) if loc in vigentes]
+            self.locaciones = [self.locaciones[i] for i in quedan]
+            self.stats, self.huella = self.stats[quedan], self.huella[quedan]
+            self.filas, self.ultima = self.filas[quedan], self.ultima[quedan]
+        cambiadas = sorted(loc for loc in vigentes if self.versiones.get(loc) != versiones[loc])
+        self.versiones = {loc: versiones[loc] for loc in vigentes}
+        if not cambiadas:
+            return resultado
+
+        nombres = df["Locación"].astype(str)
+        valores = df[COLUMNA].to_numpy(dtype=float)
+        fechas = df["Fecha_Hora"].to_numpy(dtype="datetime64[ns]")
+        mascara = nombres.isin(cambiadas).to_numpy() & ~np.isnan(valores) & ~np.isnat(fechas)
+        codigos = pd.Categorical(nombres[mascara], categories=cambiadas).codes.astype(np.intp)
+        t_ns = fechas[mascara].astype(np.int64)
+        y = np.log(np.clip(valores[mascara], PISO_CLORO, None))
+        h = huellas[mascara]
+        k = len(cambiadas)
+
+        # Índice de cada locación cambiada en los arreglos (las nuevas se agregan al final)
+        posicion = {loc: i for i, loc in enumerate(self.locaciones)}
+        nuevas = [loc for loc in cambiadas if loc not in posicion]
+        if nuevas:
+            self.locaciones = self.locaciones + nuevas
+            self.stats = np.vstack([self.stats, np.zeros((len(nuevas), 6))])
+            self.huella = np.concatenate([self.huella, np.zeros(len(nuevas), dtype=np.uint64)])
+            self.filas = np.concatenate([self.filas, np.zeros(len(nuevas), dtype=np.int64)])
+            self.ultima = np.concatenate([self.ultima, np.full(len(nuevas), SIN_FECHA, dtype=np.int64)])
+            posicion = {loc: i for i, loc in enumerate(self.locaciones)}
+        indices = np.array([posicion[loc] for loc in cambiadas], dtype=np.intp)
+
+        # Incremental solo si las filas hasta la última muestra incorporada no cambiaron
+        viejas = t_ns <= self.ultima[indices][codigos]
+        suma_viejas = np.zeros(k, dtype=np.uint64)
+        np.add.at(suma_viejas, codigos[viejas], h[viejas])
+        incremental = ((self.ultima[indices] != SIN_FECHA) & (suma_viejas == self.huella[indices])
+                       & (np.bincount(codigos[viejas], minlength=k) == self.filas[indices]))
+
+        if len(t_ns):
+            self._desplazar(int(t_ns.max()))
+        agregar = ~viejas | ~incremental[codigos]
+        c = codigos[agregar]
+        t = (t_ns[agregar] - self.referencia) / NS_DIA
+        base = np.where(incremental[:, None], self.stats[indices], 0.0)
+
+        stats, huella = self.stats.copy(), self.huella.copy()
+        filas, ultima = self.filas.copy(), self.ultima.copy()
+        stats[indices] = base + _sumas(c, t, y[agregar], np.exp2(t / self.vida_media), k)
+        suma = np.zeros(k, dtype=np.uint64)
+        np.add.at(suma, codigos, h)
+        huella[indices] = suma
+        filas[indices] = np.bincount(codigos, minlength=k)
+        recientes = np.full(k, SIN_FECHA, dtype=np.int64)
+        np.maximum.at(recientes, codigos, t_ns)
+        ultima[indices] = recientes
+        self.stats, self.huella, self.filas, self.ultima = stats, huella, filas, ultima
+
+        for loc, inc in zip(cambiadas, incremental):
+            resultado["incrementales" if inc else "completas"].append(loc)
+        return resultado
+
+    def parametros(self) -> pd.DataFrame:
+        """Ajuste de todas las locaciones a la vez: ``ln C = a + b·t`` (t en días desde la referencia)."""
+        s0, st, sy, stt, sty, n = self.stats.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            det = s0 * stt - st * st
+            # Varianza ponderada del tiempo de al menos una hora²: si no, la pendiente no es estimable
+            valido = (n >= MIN_MUESTRAS) & (det > s0 * s0 / 24 ** 2)
+            b = np.where(valido, (s0 * sty - st * sy) / det, np.nan)
+            a = np.where(valido, (sy - b * st) / s0, np.nan)
+        return pd.DataFrame({"Locación": self.locaciones, "a": a, "b": b, "Muestras": n.astype(int)})
+
+    def pronosticar(self, ahora) -> pd.DataFrame:
+        """
+        Nivel estimado ahora, decaimiento diario y horas hasta bajar de ``umbral``
+        (0 si ya está por debajo, ``inf`` si el cloro no decae, NaN sin ajuste).
+        """
+        p = self.parametros()
+        if self.referencia is None:
+            return p.assign(**{"Nivel estimado": [], "Decaimiento (%/día)": [], "Horas al umbral": []})
+        dias = (pd.Timestamp(ahora).value - self.referencia) / NS_DIA
+        a, b = p["a"].to_numpy(), p["b"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            nivel = np.exp(a + b * dias)
+            cruce = (np.log(self.umbral) - a) / b
+            horas = np.where(nivel <= self.umbral, 0.0,
+                             np.where(b < 0, (cruce - dias) * 24, np.where(np.isnan(b), np.nan, np.inf)))
+        return p.assign(**{"Nivel estimado": nivel, "Decaimiento (%/día)": (1 - np.exp(b)) * 100,
+                           "Horas al umbral": horas})
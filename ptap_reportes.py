@@ -0,0 +1,228 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Reportes PDF mensuales por locación                     ║
+║  Generación batch en paralelo (pool de procesos)                ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Uso (sin interfaz, p. ej. en el cierre de mes):
+
+    python ptap_reportes.py                      # mes anterior, todas las locaciones
+    python ptap_reportes.py --mes 2025-06 --procesos 4
+    python ptap_reportes.py --mes 2025-06 --csv respaldo.csv
+
+Cada PDF se guarda como ``<salida>/<YYYY-MM>/<locacion>_<version>.pdf``. La
+versión es la huella de los datos del mes para esa locación: si no cambiaron,
+el archivo existente se reutiliza sin volver a renderizar.
+"""
+import argparse
+import os
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+import ptap_dashboard as app
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+DIR_REPORTES = Path("reportes")
+ANCHO_GRAFICO = 17 * cm
+PARAMS = ["pH", "Turbidez (NTU)", "Cloro Residual (mg/L)"]
+
+# ═══════════════════════════════════════════════════════════════
+# UTILIDADES
+# ═══════════════════════════════════════════════════════════════
+def slug(texto: str) -> str:
+    """Nombre de archivo seguro a partir del nombre de una locación."""
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return re.sub(r"[^A-Za-z0-9]+", "_", texto).strip("_").lower()
+
+
+def ruta_reporte(salida: Path, mes: str, locacion: str, version: str) -> Path:
+    """Ruta del PDF para (mes, locación, versión de datos)."""
+    return salida / mes / f"{slug(locacion)}_{version}.pdf"
+
+
+def filtrar_mes(df: pd.DataFrame, mes: str) -> pd.DataFrame:
+    """Registros cuyo ``Fecha_dt`` cae en el mes ``YYYY-MM``."""
+    if df.empty or "Fecha_dt" not in df.columns:
+        return df.iloc[0:0]
+    periodo = pd.Period(mes, freq="M")
+    return df[df["Fecha_dt"].dt.to_period("M") == periodo]
+
+
+def cargar_datos(csv: str = None) -> pd.DataFrame:
+    """Carga los registros desde Google Sheets o desde un respaldo CSV."""
+    if csv:
+        return app.procesar_registros(pd.read_csv(csv, dtype=str, keep_default_na=False))
+    return app.leer_datos()
+
+
+def _figura_a_imagen(fig, alto_px: int) -> Image:
+    """Convierte una figura Plotly en un flowable de imagen PNG."""
+    png = fig.to_image(format="png", width=1000, height=alto_px, scale=2)
+    return Image(BytesIO(png), width=ANCHO_GRAFICO, height=ANCHO_GRAFICO * alto_px / 1000)
+
+
+def _tabla(filas: list, anchos: list = None) -> Table:
+    """Tabla con el estilo corporativo (encabezado oscuro, filas alternadas)."""
+    tabla = Table(filas, colWidths=anchos, repeatRows=1)
+    tabla.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0c1829")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f8fafc")]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+    ]))
+    return tabla
+
+
+# ═══════════════════════════════════════════════════════════════
+# RENDER DE UN REPORTE
+# ═══════════════════════════════════════════════════════════════
+def construir_pdf(df_loc: pd.DataFrame, locacion: str, mes: str) -> bytes:
+    """Arma el PDF de una locación para un mes: KPIs, heatmap y gráficos."""
+    estilos = getSampleStyleSheet()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title=f"PTAP {mes} - {locacion}",
+                            leftMargin=2 * cm, rightMargin=2 * cm,
+                            topMargin=1.5 * cm, bottomMargin=1.5 * cm)
+
+    df_loc = df_loc.sort_values("Fecha_Hora")
+    params = ["Cloro Residual (mg/L)"] if locacion.strip().lower() in app.SOLO_CLORO else PARAMS
+
+    elementos = [
+        Paragraph("Control de Calidad — Agua Potable", estilos["Title"]),
+        Paragraph(f"<b>{locacion}</b> · Reporte mensual {mes}", estilos["Heading2"]),
+        Paragraph(f"Generado: {datetime.now(app.TIMEZONE).strftime('%d/%m/%Y %H:%M')} (Lima) · "
+                  f"{len(df_loc)} muestras", estilos["Normal"]),
+        Spacer(1, 0.5 * cm),
+    ]
+
+    # --- KPIs por parámetro ---
+    filas = [["Parámetro", "Muestras", "Promedio", "Mín", "Máx", "% Cumpl.", "Último"]]
+    for param in params:
+        s = df_loc[param].dropna()
+        if s.empty:
+            filas.append([param, "0", "—", "—", "—", "—", "—"])
+            continue
+        ultimo = s.iloc[-1]
+        estado = {"ok": "Óptimo", "warn": "Alerta", "crit": "Crítico"}[app.clasificar_valor(ultimo, param)]
+        filas.append([
+            param, str(len(s)), f"{s.mean():.2f}", f"{s.min():.2f}", f"{s.max():.2f}",
+            f"{app.calcular_cumplimiento(df_loc, param)}%", f"{ultimo:.2f} ({estado})",
+        ])
+    elementos += [Paragraph("Indicadores del mes", estilos["Heading3"]), _tabla(filas), Spacer(1, 0.4 * cm)]
+
+    # --- Alertas del mes ---
+    alertas = [a for a in app.generar_alertas(df_loc, horas=None) if a["estado"] == "crit"]
+    elementos.append(Paragraph(f"Alertas críticas en el mes: <b>{len(alertas)}</b>", estilos["Normal"]))
+
+    # --- Heatmap de cumplimiento diario ---
+    heat = app.crear_heatmap_cumplimiento(df_loc, dias=9999)
+    if heat.data:
+        elementos += [Paragraph("Cumplimiento diario (cloro residual)", estilos["Heading3"]),
+                      _figura_a_imagen(heat, 260)]
+
+    # --- Gráficos por parámetro ---
+    for param in params:
+        if df_loc[param].dropna().empty:
+            continue
+        elementos += [Paragraph(param, estilos["Heading3"]),
+                      _figura_a_imagen(app.crear_grafico_parametro(df_loc, param), 320)]
+
+    doc.build(elementos)
+    return buffer.getvalue()
+
+
+def _generar_reporte(df_loc: pd.DataFrame, locacion: str, mes: str, destino: str) -> str:
+    """Tarea del pool: renderiza un PDF y lo escribe de forma atómica."""
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_suffix(".pdf.tmp")
+    tmp.write_bytes(construir_pdf(df_loc, locacion, mes))
+    os.replace(tmp, destino)
+    # Versiones anteriores del mismo (mes, locación) quedan obsoletas
+    for viejo in destino.parent.glob(f"{slug(locacion)}_*.pdf"):
+        if viejo != destino:
+            viejo.unlink(missing_ok=True)
+    return str(destino)
+
+
+# ═══════════════════════════════════════════════════════════════
+# BATCH MENSUAL
+# ═══════════════════════════════════════════════════════════════
+def generar_reportes_mes(df: pd.DataFrame, mes: str, salida: Path = DIR_REPORTES,
+                         locaciones: list = None, procesos: int = None) -> dict:
+    """
+    Genera los PDF del mes para cada locación en un pool de procesos.
+
+    Retorna ``{locacion: (ruta, "generado" | "cache" | "sin datos" | "error: ...")}``.
+    """
+    df_mes = filtrar_mes(df, mes)
+    resultado = {}
+    tareas = {}
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for loc in locaciones or app.LOCACIONES:
+            df_loc = df_mes[df_mes["Locación"] == loc] if not df_mes.empty else df_mes
+            if df_loc.empty:
+                resultado[loc] = (None, "sin datos")
+                continue
+            destino = ruta_reporte(Path(salida), mes, loc, app.version_datos(df_loc))
+            if destino.exists():
+                resultado[loc] = (str(destino), "cache")
+                continue
+            tareas[pool.submit(_generar_reporte, df_loc, loc, mes, str(destino))] = loc
+
+        for futuro in as_completed(tareas):
+            loc = tareas[futuro]
+            try:
+                resultado[loc] = (futuro.result(), "generado")
+            except Exception as e:
+                resultado[loc] = (None, f"error: {e}")
+    return resultado
+
+
+def _mes_anterior() -> str:
+    primero = datetime.now(app.TIMEZONE).replace(day=1)
+    return (pd.Period(primero.strftime("%Y-%m"), freq="M") - 1).strftime("%Y-%m")
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Reportes PDF mensuales por locación (PTAP).")
+    parser.add_argument("--mes", default=_mes_anterior(), help="Mes a reportar, formato YYYY-MM (por defecto: mes anterior)")
+    parser.add_argument("--salida", default=str(DIR_REPORTES), help="Directorio de salida")
+    parser.add_argument("--csv", help="Usar un respaldo CSV en lugar de Google Sheets")
+    parser.add_argument("--locacion", action="append", help="Limitar a una locación (repetible)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto: núcleos disponibles)")
+    args = parser.parse_args(argv)
+
+    periodo = pd.Period(args.mes, freq="M")
+    df = app.con_archivo(cargar_datos(args.csv), periodo.start_time, periodo.end_time)
+    if df.empty:
+        print("No hay datos para generar reportes.", file=sys.stderr)
+        return 1
+
+    resultado = generar_reportes_mes(df, args.mes, Path(args.salida), args.locacion, args.procesos)
+    errores = 0
+    for loc, (ruta, estado) in resultado.items():
+        errores += estado.startswith("error")
+        print(f"{estado:>10}  {loc}" + (f"  → {ruta}" if ruta else ""))
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Backend simulado y datos sintéticos                     ║
+║  Para pruebas de carga, recuperación y benchmarks sin Sheets    ║
+╚══════════════════════════════════════════════════════════════════╝
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ptap_dashboard import LOCACIONES, SOLO_CLORO
+
+# Columnas del Google Sheet, en el orden en que las escribe guardar_muestra
+ENCABEZADOS = [
+    "Fecha", "Hora de Toma", "Hora de Registro", "Operador", "Locación",
+    "pH", "Turbidez (NTU)", "Cloro Residual (mg/L)", "Observaciones", "Foto", "ID Registro",
+]
+OPERADORES = ["Jorge Perez Padilla", "Luis Sangama Ricopa", "Jose Soto Dávila"]
+
+
+class ConexionCaida(ConnectionError):
+    """Falla simulada de red hacia el backend."""
+
+
+class HojaSimulada:
+    """
+    Worksheet en memoria con la misma interfaz de gspread que usa la app.
+
+    ``prob_fallo`` hace fallar la llamada antes de escribir; ``prob_respuesta_perdida``
+    escribe las filas y luego falla (la respuesta nunca llega al cliente), que es el
+    caso que obliga a reintentar con claves de idempotencia.
+    """
+
+    def __init__(self, filas: list = None, encabezados: list = None, prob_fallo: float = 0.0,
+                 prob_respuesta_perdida: float = 0.0, latencia: float = 0.0, semilla: int = None):
+        self.encabezados = list(encabezados or ENCABEZADOS)
+        self.filas = [list(f) for f in (filas or [])]
+        self.prob_fallo = prob_fallo
+        self.prob_respuesta_perdida = prob_respuesta_perdida
+        self.latencia = latencia
+        self.llamadas = Counter()
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def _llamada(self, nombre: str):
+        self.llamadas[nombre] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self._rng.random() < self.prob_fallo:
+            raise ConexionCaida(f"conexión interrumpida en {nombre}")
+
+    def _respuesta(self, nombre: str):
+        if self._rng.random() < self.prob_respuesta_perdida:
+            raise ConexionCaida(f"respuesta perdida en {nombre}")
+
+    # --- Lectura ---
+    def get_all_values(self) -> list:
+        self._llamada("get_all_values")
+        with self._lock:
+            return [list(self.encabezados)] + [list(f) for f in self.filas]
+
+    def get_all_records(self) -> list:
+        self._llamada("get_all_records")
+        with self._lock:
+            return [dict(zip(self.encabezados, f)) for f in self.filas]
+
+    def col_values(self, col: int) -> list:
+        self._llamada("col_values")
+        with self._lock:
+            valores = [self.encabezados[col - 1] if col <= len(self.encabezados) else ""]
+            valores += [f[col - 1] if col <= len(f) else "" for f in self.filas]
+        # gspread omite las celdas vacías al final de la columna
+        while valores and valores[-1] == "":
+            valores.pop()
+        return valores
+
+    def row_values(self, fila: int) -> list:
+        self._llamada("row_values")
+        with self._lock:
+            valores = self.encabezados if fila == 1 else self.filas[fila - 2] if fila - 2 < len(self.filas) else []
+            return [str(v) for v in valores]
+
+    def get_values(self, rango: str) -> list:
+        """Solo rangos de la forma ``A<fila>:<col>`` (desde una fila hasta el final)."""
+        self._llamada("get_values")
+        inicio = int(re.match(r"[A-Z]+(\d+)", rango).group(1))
+        with self._lock:
+            return [[str(v) for v in f] for f in self.filas[inicio - 2:]]
+
+    # --- Escritura ---
+    def delete_rows(self, inicio: int, fin: int = None):
+        """Borra filas por número de fila del Sheet (la 1 es el encabezado)."""
+        self._llamada("delete_rows")
+        fin = inicio if fin is None else fin
+        with self._lock:
+            del self.filas[inicio - 2:fin - 1]
+
+    def append_row(self, fila: list, **kwargs):
+        self.append_rows([fila], **kwargs)
+
+    def append_rows(self, filas: list, **kwargs):
+        self._llamada("append_rows")
+        with self._lock:
+            self.filas.extend(list(f) for f in filas)
+        self._respuesta("append_rows")
+
+
+# ═══════════════════════════════════════════════════════════════
+# DATOS SINTÉTICOS
+# ═══════════════════════════════════════════════════════════════
+def generar_filas(n: int, dias: int = 90, hasta: datetime = None, semilla: int = 0) -> list:
+    """
+    Genera ``n`` filas de muestras plausibles (en el formato del Sheet), repartidas
+    en los últimos ``dias`` y ordenadas por fecha de toma.
+    """
+    rng = np.random.default_rng(semilla)
+    hasta = hasta or datetime.now()
+    offsets = np.sort(rng.uniform(0, dias * 86400, n))[::-1]
+    locs = rng.choice(LOCACIONES, n)
+    ops = rng.choice(OPERADORES, n)
+    ph = rng.normal(7.4, 0.6, n).round(1)
+    turb = rng.gamma(2.0, 1.4, n).round(2)
+    cloro = np.clip(rng.normal(0.9, 0.35, n), 0, None).round(2)
+
+    filas = []
+    for i in range(n):
+        t = hasta - timedelta(seconds=float(offsets[i]))
+        solo_cloro = locs[i].strip().lower() in SOLO_CLORO
+        filas.append([
+            t.strftime("%Y-%m-%d"), t.strftime("%H:%M"), t.strftime("%H:%M:%S"),
+            str(ops[i]), str(locs[i]),
+            "" if solo_cloro else float(ph[i]),
+            "" if solo_cloro else float(turb[i]),
+            float(cloro[i]),
+            "", "", f"sim-{semilla}-{i}",
+        ])
+    return filas
+
+
+def generar_muestras(n: int, dias: int = 365, hasta: datetime = None, semilla: int = 0) -> pd.DataFrame:
+    """
+    Versión vectorizada de ``generar_filas`` para benchmarks de millones de filas:
+    DataFrame ya procesado con solo las columnas que usan los análisis
+    (``Fecha_dt``, ``Fecha_Hora``, operador, locación y parámetros).
+    """
+    rng = np.random.default_rng(semilla)
+    hasta = pd.Timestamp(hasta or datetime.now()).floor("min")
+    fecha_hora = hasta - pd.to_timedelta(np.sort(rng.integers(0, dias * 1440, n))[::-1], unit="min")
+    locs = pd.Categorical.from_codes(rng.integers(0, len(LOCACIONES), n), LOCACIONES)
+    solo_cloro = np.isin(np.asarray(locs.codes), [i for i, loc in enumerate(LOCACIONES)
+                                                  if loc.strip().lower() in SOLO_CLORO])
+    return pd.DataFrame({
+        "Fecha_dt": fecha_hora.floor("D"),
+        "Fecha_Hora": fecha_hora,
+        "Operador": pd.Categorical.from_codes(rng.integers(0, len(OPERADORES), n), OPERADORES),
+        "Locación": locs,
+        "pH": np.where(solo_cloro, np.nan, rng.normal(7.4, 0.6, n).round(1)),
+        "Turbidez (NTU)": np.where(solo_cloro, np.nan, rng.gamma(2.0, 1.4, n).round(2)),
+        "Cloro Residual (mg/L)": np.clip(rng.normal(0.9, 0.35, n), 0, None).round(2),
+    })
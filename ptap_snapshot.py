@@ -0,0 +1,99 @@
+"""
+╔══════════════════════════════════════════════════════════════════╗
+║  PTAP - Snapshot Arrow para arranques en caliente               ║
+║  Tabla de muestras + agregados en Feather (mapeado en memoria)  ║
+╚══════════════════════════════════════════════════════════════════╝
+
+Después de cada lectura completa del Google Sheet, la tabla ya procesada
+(tipos limpios, ``Fecha_dt``/``Fecha_Hora``) y sus agregados se escriben en
+archivos Arrow IPC (Feather v2, sin compresión) en disco local. Al reiniciar,
+el archivo se abre con ``memory_map``: no hay descarga ni parseo; las columnas
+numéricas sin nulos se leen sin copia y las de texto se convierten a objetos
+Python (sí se copian). El dashboard queda usable de inmediato y
+un hilo en segundo plano trae solo las filas agregadas desde el snapshot.
+
+    <DIR_SNAPSHOT>/<planta>.arrow              # muestras
+    <DIR_SNAPSHOT>/<planta>.<agregado>.arrow   # agregados (p. ej. resumen por locación)
+"""
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═══════════════════════════════════════════════════════════════
+DIR_SNAPSHOT = Path(os.environ.get("PTAP_SNAPSHOT", "datos_locales/snapshot"))
+CLAVE_META = b"ptap"
+
+
+def ruta_snapshot(planta: str, directorio: Path = DIR_SNAPSHOT, agregado: str = None) -> Path:
+    nombre = f"{planta}.{agregado}.arrow" if agregado else f"{planta}.arrow"
+    return Path(directorio) / nombre
+
+
+def _escribir(df: pd.DataFrame, ruta: Path, meta: dict):
+    """Escritura atómica (archivo temporal + ``os.replace``) con metadatos en el esquema."""
+    # get_all_records mezcla números y textos en columnas libres (p. ej. Observaciones)
+    mixtas = [c for c in df.columns[df.dtypes == object]
+              if pd.api.types.infer_dtype(df[c], skipna=True) not in ("string", "empty")]
+    if mixtas:
+        df = df.assign(**{c: df[c].astype(str) for c in mixtas})
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}),
+                                           CLAVE_META: json.dumps(meta).encode()})
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f".{ruta.name}.{uuid.uuid4().hex[:8]}.tmp")
+    feather.write_feather(tabla, tmp, compression="uncompressed")
+    os.replace(tmp, ruta)
+
+
+def _leer(ruta: Path) -> tuple:
+    tabla = feather.read_table(ruta, memory_map=True)
+    meta = json.loads((tabla.schema.metadata or {}).get(CLAVE_META, b"{}"))
+    return tabla.to_pandas(split_blocks=True), meta
+
+
+# ═══════════════════════════════════════════════════════════════
+# API
+# ═══════════════════════════════════════════════════════════════
+def guardar_snapshot(planta: str, df: pd.DataFrame, version: str, filas_hoja: int,
+                     agregados: dict = None, directorio: Path = DIR_SNAPSHOT) -> dict:
+    """
+    Persiste la tabla de muestras y sus agregados. ``filas_hoja`` es la cantidad
+    de filas de datos del Sheet en el momento de la lectura (punto de partida del
+    sync delta). Los agregados se escriben primero: el archivo principal solo
+    apunta a una versión cuyos agregados ya están en disco.
+    """
+    meta = {"version": version, "filas_hoja": int(filas_hoja), "guardado": time.time()}
+    for nombre, tabla in (agregados or {}).items():
+        _escribir(tabla, ruta_snapshot(planta, directorio, nombre), {"version": version})
+    _escribir(df, ruta_snapshot(planta, directorio), {**meta, "agregados": sorted(agregados or {})})
+    return meta
+
+
+def cargar_snapshot(planta: str, directorio: Path = DIR_SNAPSHOT):
+    """
+    ``(df, agregados, meta)`` desde el snapshot mapeado en memoria, o ``None`` si
+    no existe o está dañado. Un agregado de otra versión se descarta.
+    """
+    ruta = ruta_snapshot(planta, directorio)
+    try:
+        df, meta = _leer(ruta)
+    except (OSError, pa.ArrowInvalid, ValueError):
+        return None
+    agregados = {}
+    for nombre in meta.get("agregados", []):
+        try:
+            tabla, meta_ag = _leer(ruta_snapshot(planta, directorio, nombre))
+        except (OSError, pa.ArrowInvalid, ValueError):
+            continue
+        if meta_ag.get("version") == meta.get("version"):
+            agregados[nombre] = tabla
+    df.attrs["version"] = meta.get("version")
+    return df, agregados, meta